@@ -0,0 +1,177 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+#---------------------
+# apiMetrics.py
+# Delivers the collection of metrics on the requests sent to the GitHub API by goMine.py
+# Author: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# Every request is recorded with its endpoint class (repo, branches, forks, commits, commit,
+# rate_limit or other, see endpointClass), its latency, the size of its response body, its status
+# and the remaining requests of the token after the request. The time spent sleeping until the
+# reset of the rate limits or before retrying a request is recorded as well. Metrics are aggregated
+# per scope (the project and repository being mined) and can be merged with the metrics collected
+# by other processes.
+# The report is a JSON object:
+# - 'endpoints': one record per scope and endpoint class with the number of requests per status,
+#   the number of requests answered with a '304 Not Modified', the total and maximal latency in
+#   seconds and the number of bytes received
+# - 'repositories': one record per scope with the total time spent sleeping in seconds and the
+#   lowest number of remaining requests seen
+# - 'totals': the endpoint records summed over all scopes
+# It can also be written in the text format of Prometheus (see writePrometheus).
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+import os
+import json
+import threading
+from urllib.parse import urlparse
+
+def endpointClass(url):
+    # returns the class of the endpoint of the GitHub API addressed by the URL
+    parts = urlparse(url).path.strip('/').split('/')
+    if parts == ['rate_limit']:
+        return 'rate_limit'
+    if len(parts) < 3 or parts[0] != 'repos':
+        return 'other'
+    if len(parts) == 3:
+        return 'repo'
+    if len(parts) == 4 and parts[3] in ('branches', 'forks', 'commits'):
+        return parts[3]
+    if len(parts) == 5 and parts[3] == 'commits':
+        return 'commit'
+    return 'other'
+
+def newEndpointRecord(project, repository, endpoint):
+    return {'project': project, 'repository': repository, 'endpoint': endpoint, 'requests': 0, 'status': {},
+            'not_modified': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'bytes': 0}
+
+def newRepositoryRecord(project, repository):
+    return {'project': project, 'repository': repository, 'pause_seconds': 0.0, 'remaining_min': None}
+
+class apiMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.project = ''
+        self.repository = ''
+        self.reset()
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+            self.repositories = {}
+    def setScope(self, project, repository):
+        # the requests recorded from now on are attributed to this project and repository
+        with self.lock:
+            self.project = project
+            self.repository = repository
+    def endpointRecord(self, project, repository, endpoint):
+        key = (project, repository, endpoint)
+        if not key in self.endpoints:
+            self.endpoints[key] = newEndpointRecord(project, repository, endpoint)
+        return self.endpoints[key]
+    def repositoryRecord(self, project, repository):
+        key = (project, repository)
+        if not key in self.repositories:
+            self.repositories[key] = newRepositoryRecord(project, repository)
+        return self.repositories[key]
+    def record(self, url, seconds, size, status, notModified=False, remaining=None):
+        with self.lock:
+            record = self.endpointRecord(self.project, self.repository, endpointClass(url))
+            record['requests'] += 1
+            record['status'][str(status)] = record['status'].get(str(status), 0) + 1
+            if notModified:
+                record['not_modified'] += 1
+            record['seconds'] += seconds
+            record['max_seconds'] = max(record['max_seconds'], seconds)
+            record['bytes'] += size
+            repositoryRecord = self.repositoryRecord(self.project, self.repository)
+            if remaining is not None and (repositoryRecord['remaining_min'] is None or remaining < repositoryRecord['remaining_min']):
+                repositoryRecord['remaining_min'] = remaining
+    def recordPause(self, seconds):
+        with self.lock:
+            self.repositoryRecord(self.project, self.repository)['pause_seconds'] += seconds
+    def merge(self, report):
+        # adds the metrics of a report (e.g. collected by another process)
+        with self.lock:
+            for other in report['endpoints']:
+                record = self.endpointRecord(other['project'], other['repository'], other['endpoint'])
+                for field in ('requests', 'not_modified', 'seconds', 'bytes'):
+                    record[field] += other[field]
+                record['max_seconds'] = max(record['max_seconds'], other['max_seconds'])
+                for status, count in other['status'].items():
+                    record['status'][status] = record['status'].get(status, 0) + count
+            for other in report['repositories']:
+                record = self.repositoryRecord(other['project'], other['repository'])
+                record['pause_seconds'] += other['pause_seconds']
+                if record['remaining_min'] is None or (other['remaining_min'] is not None and other['remaining_min'] < record['remaining_min']):
+                    record['remaining_min'] = other['remaining_min']
+    def report(self):
+        with self.lock:
+            endpoints = [json.loads(json.dumps(record)) for record in self.endpoints.values()]
+            repositories = [dict(record) for record in self.repositories.values()]
+        totals = {}
+        for record in endpoints:
+            total = totals.setdefault(record['endpoint'], newEndpointRecord('', '', record['endpoint']))
+            for field in ('requests', 'not_modified', 'seconds', 'bytes'):
+                total[field] += record[field]
+            total['max_seconds'] = max(total['max_seconds'], record['max_seconds'])
+            for status, count in record['status'].items():
+                total['status'][status] = total['status'].get(status, 0) + count
+        for total in totals.values():
+            del total['project'], total['repository']
+        return {'endpoints': endpoints, 'repositories': repositories, 'totals': totals}
+    def requests(self):
+        with self.lock:
+            return sum(record['requests'] for record in self.endpoints.values())
+    def pauseSeconds(self):
+        with self.lock:
+            return sum(record['pause_seconds'] for record in self.repositories.values())
+    def writeReport(self, fileName):
+        with open(fileName, 'w') as json_file:
+            json.dump(self.report(), json_file, indent=1)
+    def writePrometheus(self, fileName):
+        # writes the metrics in the text format of Prometheus (e.g. for the textfile collector of the node exporter)
+        report = self.report()
+        lines = []
+        def label(record):
+            return 'project="{}",repository="{}",endpoint="{}"'.format(record['project'], record['repository'], record['endpoint'])
+        lines.append('# HELP gomine_api_requests_total Number of requests sent to the GitHub API.')
+        lines.append('# TYPE gomine_api_requests_total counter')
+        for record in report['endpoints']:
+            for status, count in sorted(record['status'].items()):
+                lines.append('gomine_api_requests_total{' + label(record) + ',status="' + status + '"} ' + str(count))
+        lines.append('# HELP gomine_api_not_modified_total Number of requests answered with a 304 Not Modified.')
+        lines.append('# TYPE gomine_api_not_modified_total counter')
+        for record in report['endpoints']:
+            lines.append('gomine_api_not_modified_total{' + label(record) + '} ' + str(record['not_modified']))
+        lines.append('# HELP gomine_api_request_seconds Latency of the requests sent to the GitHub API.')
+        lines.append('# TYPE gomine_api_request_seconds summary')
+        for record in report['endpoints']:
+            lines.append('gomine_api_request_seconds_sum{' + label(record) + '} ' + str(round(record['seconds'], 6)))
+            lines.append('gomine_api_request_seconds_count{' + label(record) + '} ' + str(record['requests']))
+        lines.append('# HELP gomine_api_response_bytes_total Size of the response bodies received from the GitHub API.')
+        lines.append('# TYPE gomine_api_response_bytes_total counter')
+        for record in report['endpoints']:
+            lines.append('gomine_api_response_bytes_total{' + label(record) + '} ' + str(record['bytes']))
+        lines.append('# HELP gomine_pause_seconds_total Time spent waiting for the reset of the rate limits.')
+        lines.append('# TYPE gomine_pause_seconds_total counter')
+        for record in report['repositories']:
+            lines.append('gomine_pause_seconds_total{project="' + record['project'] + '",repository="' + record['repository'] + '"} '
+                         + str(round(record['pause_seconds'], 3)))
+        lines.append('# HELP gomine_rate_limit_remaining_min Lowest number of remaining requests seen.')
+        lines.append('# TYPE gomine_rate_limit_remaining_min gauge')
+        for record in report['repositories']:
+            if record['remaining_min'] is not None:
+                lines.append('gomine_rate_limit_remaining_min{project="' + record['project'] + '",repository="' + record['repository'] + '"} '
+                             + str(record['remaining_min']))
+        # write in a temporary file first, so that a collector never reads an incomplete file
+        with open(fileName + ".tmp", 'w') as textFile:
+            textFile.write("\n".join(lines) + "\n")
+        os.replace(fileName + ".tmp", fileName)
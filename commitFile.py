@@ -0,0 +1,107 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+#---------------------
+# commitFile.py
+# Delivers functions to read and write files of commits record by record
+# Author: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# The format of a commit file depends on its extension:
+# - ".json": a JSON list of commits (legacy format, has to be decoded as a whole when read)
+# - ".jsonl": JSON Lines, one commit per line
+# - ".jsonl.gz": JSON Lines compressed with gzip
+# - ".manifest.json": a JSON list of commit shas, the commits being saved in a commit store
+# A commitFile can be iterated several times, each iteration streams the file again, so that
+# the commits never need to be held in memory all at once (except for the legacy format).
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+import os
+import gzip
+import json
+
+# extensions of commit files, in the order in which they are searched for
+commitFileExtensions = ['.commits.jsonl.gz', '.commits.jsonl', '.commits.json']
+
+def openText(fileName, mode):
+    if fileName.endswith('.gz'):
+        return gzip.open(fileName, mode + 't', encoding='utf-8')
+    return open(fileName, mode, encoding='utf-8')
+
+class commitFile:
+    def __init__(self, fileName, store=None):
+        self.fileName = fileName
+        self.store = store
+    def __iter__(self):
+        if self.fileName.endswith('.manifest.json'):
+            with open(self.fileName) as json_file:
+                shas = json.load(json_file)
+            for sha in shas:
+                yield self.store.get(sha)
+        elif self.fileName.endswith('.json'):
+            with open(self.fileName) as json_file:
+                commits = json.load(json_file)
+            for commit in commits:
+                yield commit
+        else:
+            with openText(self.fileName, 'r') as jsonl_file:
+                for line in jsonl_file:
+                    if line.strip() != '':
+                        yield json.loads(line)
+
+class commitChain:
+    # concatenation of several iterables of commits (e.g. commit files), which can be iterated several times as well
+    def __init__(self, iterables):
+        self.iterables = iterables
+    def __iter__(self):
+        for commits in self.iterables:
+            for commit in commits:
+                yield commit
+
+class commitWriter:
+    # writes commits one by one in a temporary file, which replaces the target file when closed
+    def __init__(self, fileName, store=None):
+        self.fileName = fileName
+        self.store = store
+        self.count = 0
+        if fileName.endswith('.gz'):
+            self.tmpFileName = fileName[:-3] + ".tmp.gz"
+        else:
+            self.tmpFileName = fileName + ".tmp"
+        self.file = openText(self.tmpFileName, 'w')
+        self.jsonList = fileName.endswith('.json')
+        if self.jsonList:
+            self.file.write("[")
+    def write(self, commit):
+        if self.store is not None:
+            self.store.put(commit)
+            record = json.dumps(commit['sha'])
+        else:
+            record = json.dumps(commit)
+        if self.jsonList:
+            if self.count != 0:
+                self.file.write(",\n")
+            self.file.write(record)
+        else:
+            self.file.write(record + "\n")
+        self.count += 1
+    def close(self):
+        if self.jsonList:
+            self.file.write("]")
+        self.file.close()
+        os.replace(self.tmpFileName, self.fileName)
+    def __enter__(self):
+        return self
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.close()
+        else:
+            # do not replace the target file by an incomplete one
+            self.file.close()
+            os.remove(self.tmpFileName)
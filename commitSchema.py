@@ -0,0 +1,77 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+#---------------------
+# commitSchema.py
+# Delivers the schema of the commit fields kept when commits are extracted or compacted
+# Author: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# The GitHub API delivers commits with many fields which are never used by the analysis scripts,
+# the bulk of them being the text of the diff of every file ('patch'). A schema describes the fields
+# to be kept, as a JSON object mirroring the structure of a commit:
+# - a field set to true is kept as a whole
+# - a field set to an object is reduced to the fields of this object (in the case of lists, every
+#   element of the list is reduced)
+# - fields missing in the schema or set to false are dropped
+# A schema file containing only 'true' keeps the commits as they are delivered by GitHub.
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+import json
+
+# fields used by goMine.py (sha, url and parents) and by goCreateGraphs.py
+defaultSchema = {
+    'sha': True,
+    'url': True,
+    'commit': {'author': True, 'committer': True, 'message': True, 'url': True},
+    'author': {'login': True},
+    'committer': {'login': True},
+    'parents': {'sha': True, 'url': True},
+    'stats': True,
+    'files': {'filename': True, 'status': True, 'additions': True, 'deletions': True, 'changes': True,
+              'previous_filename': True}}
+
+def loadSchema(fileName='', keepPatches=False):
+    # returns the schema given in the file, or the default schema if no file name is given
+    if fileName != '':
+        with open(fileName) as json_file:
+            schema = json.load(json_file)
+    else:
+        schema = json.loads(json.dumps(defaultSchema))
+    if keepPatches and isinstance(schema, dict) and isinstance(schema.get('files'), dict):
+        schema['files']['patch'] = True
+    return schema
+
+def project(value, schema):
+    # returns the value reduced to the fields of the schema
+    if schema is True or value is None:
+        return value
+    if isinstance(value, list):
+        return [project(element, schema) for element in value]
+    if isinstance(value, dict):
+        return {field: project(value[field], schema[field]) for field in schema if field in value and schema[field] is not False}
+    return value
+
+def covers(schema, other):
+    # returns True if the fields of the schema include all fields of the other schema
+    if schema is True or other is False:
+        return True
+    if other is True or not isinstance(schema, dict):
+        return False
+    return all(covers(schema.get(field, False), other[field]) for field in other)
+
+def merge(schema, other):
+    # returns the schema keeping the fields of both schemas
+    if schema is True or other is True:
+        return True
+    if not isinstance(schema, dict):
+        return other
+    if not isinstance(other, dict):
+        return schema
+    return {field: merge(schema.get(field, False), other.get(field, False)) for field in list(schema) + [field for field in other if not field in schema]}
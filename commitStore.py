@@ -0,0 +1,62 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+#---------------------
+# commitStore.py
+# Delivers a content-addressed store of commits shared by repositories, forks and projects
+# Author: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# The store is a directory holding one JSON file per commit, named after the sha of the commit:
+# <store>/<first two characters of the sha>/<sha>.json
+# Commits are stored reduced to the fields of a schema (see commitSchema.py), and every file records
+# this schema along with the commit: {"schema": ..., "commit": ...}. A commit is only rewritten when
+# it is put with fields the stored one lacks (e.g. with the patches, see the option -k of goMine.py),
+# the stored commit then keeping the fields of both schemas. Files holding a bare commit (written by
+# earlier versions) are taken as reduced to the default schema.
+# Lists of commits (per repository or per project) are saved as manifests: JSON lists of shas
+# (see commitFile.py).
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+import os
+import json
+import threading
+from commitSchema import defaultSchema, covers
+
+class commitStore:
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+    def path(self, sha):
+        return os.path.join(self.directory, sha[:2], sha + ".json")
+    def __contains__(self, sha):
+        return os.path.exists(self.path(sha))
+    def load(self, sha):
+        # returns the stored commit and the schema it is reduced to
+        with open(self.path(sha)) as json_file:
+            data = json.load(json_file)
+        if 'commit' in data and 'schema' in data and not 'sha' in data:
+            return data['commit'], data['schema']
+        return data, defaultSchema
+    def get(self, sha):
+        return self.load(sha)[0]
+    def schema(self, sha):
+        return self.load(sha)[1]
+    def put(self, commit, schema=None):
+        # the schema of a commit given without schema is unknown, it is only stored if it is missing
+        fileName = self.path(commit['sha'])
+        if os.path.exists(fileName) and (schema is None or covers(self.schema(commit['sha']), schema)):
+            return
+        os.makedirs(os.path.dirname(fileName), exist_ok=True)
+        # write in a temporary file first so that a crash never leaves a truncated commit in the store
+        tmpFileName = fileName + "." + str(os.getpid()) + "." + str(threading.get_ident()) + ".tmp"
+        with open(tmpFileName, 'w') as json_file:
+            json.dump({'schema': defaultSchema if schema is None else schema, 'commit': commit}, json_file)
+        os.replace(tmpFileName, fileName)
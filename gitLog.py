@@ -0,0 +1,115 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+#---------------------
+# gitLog.py
+# Delivers functions to extract branches and commits from a local git repository in the Json
+# format provided by the GitHub API, so that commits can be mined without the GitHub API
+# Author: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# The extracted commits carry the fields of the GitHub API used by goCreateGraphs.py: sha, url,
+# parents, commit (author, committer, dates, message), stats and files (filename, status, additions,
+# deletions, changes, previous_filename). Dates are given in UTC. Since the GitHub accounts of the
+# authors are not known locally, 'author' and 'committer' are null, as GitHub gives them for unknown users.
+# The file changes of merge commits are given in respect of their first parent, as GitHub does.
+# Requires git 2.31 or newer.
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+import os
+import subprocess
+
+# status letters of 'git log --name-status' and their GitHub equivalent
+fileStatus = {'A': 'added', 'D': 'removed', 'M': 'modified', 'R': 'renamed', 'C': 'copied', 'T': 'changed'}
+
+def git(gitDir, arguments):
+    environment = dict(os.environ, TZ='UTC')
+    result = subprocess.run(['git', '--git-dir', gitDir] + arguments, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, env=environment, check=True)
+    return result.stdout.decode('utf-8', errors='replace')
+
+def cloneRepository(url, gitDir):
+    # bare clone of the repository, only the branches are fetched
+    subprocess.run(['git', 'clone', '--bare', '--quiet', url, gitDir], stdout=subprocess.PIPE,
+                   stderr=subprocess.PIPE, check=True)
+
+def listBranches(gitDir, commitUrlRoot):
+    # returns the branches in the format of the GitHub API: {'name': ..., 'commit': {'sha': ..., 'url': ...}}
+    branches = []
+    for line in git(gitDir, ['for-each-ref', '--format=%(refname:short) %(objectname)', 'refs/heads']).splitlines():
+        name, sha = line.rsplit(' ', 1)
+        branches.append({'name': name, 'commit': {'sha': sha, 'url': commitUrlRoot + "/" + sha}})
+    return branches
+
+def diffRecords(gitDir, revisions, diffOption):
+    # yields (sha, list of the \0 separated fields of the diff of the commit)
+    output = git(gitDir, ['log', '-z', '--format=%x1e%H', diffOption, '-M', '--diff-merges=first-parent'] + revisions)
+    for record in output.split('\x1e')[1:]:
+        sha, _, diff = record.partition('\x00')
+        yield sha, diff.lstrip('\n').split('\x00')
+
+def fileChanges(gitDir, revisions):
+    # returns for each commit the list of its file changes in the format of the GitHub API
+    changes = {}
+    for sha, fields in diffRecords(gitDir, revisions, '--name-status'):
+        files = []
+        i = 0
+        while i < len(fields) and fields[i] != '':
+            status = fileStatus.get(fields[i][0], 'modified')
+            if fields[i][0] in 'RC':
+                files.append({'filename': fields[i+2], 'status': status, 'previous_filename': fields[i+1]})
+                i += 3
+            else:
+                files.append({'filename': fields[i+1], 'status': status})
+                i += 2
+        changes[sha] = files
+    for sha, fields in diffRecords(gitDir, revisions, '--numstat'):
+        files = changes[sha]
+        i = 0
+        k = 0
+        while i < len(fields) and fields[i] != '' and k < len(files):
+            additions, deletions, path = fields[i].split('\t', 2)
+            # binary files have no line statistics
+            files[k]['additions'] = int(additions) if additions != '-' else 0
+            files[k]['deletions'] = int(deletions) if deletions != '-' else 0
+            files[k]['changes'] = files[k]['additions'] + files[k]['deletions']
+            i += 3 if path == '' else 1
+            k += 1
+    return changes
+
+def logCommits(gitDir, commitUrlRoot, revisions, options=[], pathspecs=[]):
+    # yields the commits reachable from the given revisions in the format of the GitHub API
+    # options (e.g. '--since=...') and pathspecs limit the commits, the file changes of the commits are complete
+    if len(revisions) == 0:
+        return
+    if len(pathspecs) != 0:
+        revisions = ['--full-diff'] + options + revisions + ['--'] + pathspecs
+    else:
+        revisions = options + revisions
+    changes = fileChanges(gitDir, revisions)
+    output = git(gitDir, ['log', '-z', '--date=format-local:%Y-%m-%dT%H:%M:%SZ',
+                          '--format=%H%x1f%P%x1f%an%x1f%ae%x1f%ad%x1f%cn%x1f%ce%x1f%cd%x1f%B'] + revisions)
+    for record in output.split('\x00'):
+        if record.strip() == '':
+            continue
+        sha, parents, aName, aEmail, aDate, cName, cEmail, cDate, message = record.lstrip('\n').split('\x1f', 8)
+        files = changes.get(sha, [])
+        additions = sum(file['additions'] for file in files)
+        deletions = sum(file['deletions'] for file in files)
+        yield {'sha': sha,
+               'url': commitUrlRoot + "/" + sha,
+               'commit': {'author': {'name': aName, 'email': aEmail, 'date': aDate},
+                          'committer': {'name': cName, 'email': cEmail, 'date': cDate},
+                          'message': message.rstrip('\n'),
+                          'url': commitUrlRoot + "/" + sha},
+               'author': None,
+               'committer': None,
+               'parents': [{'sha': parent, 'url': commitUrlRoot + "/" + parent} for parent in parents.split()],
+               'stats': {'total': additions + deletions, 'additions': additions, 'deletions': deletions},
+               'files': files}
@@ -0,0 +1,189 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+# ---------------------
+# goBenchmark.py
+# measures the performance of goMine.py against a local stand-in of the GitHub API (see mockGitHub.py)
+# and reports the number of requests issued, the number of requests per extracted commit, the wall 
+# time and the peak memory of the mining process
+# Authors: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# PREREQUISITES:
+# ---------------
+# - the libraries required by goMine.py
+# - the peak memory is only measured on Unix systems (module 'resource')
+#
+# ARGUMENTS:
+# ----------
+# see help() function
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+# standard python libraries
+import os
+import sys
+import csv
+import time
+import shutil
+import tempfile
+import subprocess
+from getopt import getopt, GetoptError
+from sys import exit, argv
+# own libraries
+from mockGitHub import mockGitHub
+try:
+    import resource
+except ImportError:
+    resource = None
+
+#############################################################################################
+# FUNCTION help
+#############################################################################################
+
+def help():
+    print('Optional Arguments:')
+    print('-m     --mineroptions <options>  options given to goMine.py, e.g. "-n 8 -l" (default: none)')
+    print('-c     --csv <path>              CSV file to which the results are appended')
+    print('-k     --keep                    keep the output of goMine.py (the directory is printed)')
+    print('       --repos <n>               number of root repositories (default: 1)')
+    print('       --commits <n>             number of commits of each root repository (default: 1000)')
+    print('       --shape <shape>           shape of the history: linear or merges (default: linear)')
+    print('       --forks <n>               number of forks of each repository (default: 0)')
+    print('       --forkdepth <n>           number of levels of forks (default: 1)')
+    print('       --forkcommits <n>         number of commits added by each fork (default: 10)')
+    print('       --branches <n>            number of branches of each root repository (default: 1)')
+    print('       --files <n>               number of file changes per commit (default: 3)')
+    print('       --latency <s>             latency added to each response in seconds (default: 0.02)')
+    print('       --ratelimit <n>           number of allowed requests per token and window (default: 5000)')
+    print('       --ratewindow <s>          length of the rate limit window in seconds (default: 3600)')
+    print('       --errorrate <x>           share of requests answered with a server error (default: 0)')
+    print('       --throttlerate <x>        share of requests throttled by a secondary rate limit (default: 0)')
+    print('-h     --help                    calls help function')
+    exit()
+
+###################################################################################################################
+# FUNCTION countCommits
+###################################################################################################################
+# returns the number of distinct commits in the aggregated commit files of a directory
+
+def countCommits(directory):
+    from commitFile import commitFile, commitFileExtensions
+    shas = set()
+    for fileName in os.listdir(directory):
+        if fileName.endswith(tuple('.aggregated' + extension for extension in commitFileExtensions)):
+            shas.update(commit['sha'] for commit in commitFile(os.path.join(directory, fileName)))
+    return len(shas)
+
+###################################################################################################################
+# FUNCTION runBenchmark
+###################################################################################################################
+# runs goMine.py on all root repositories of the mock and returns the measured indicators
+
+def runBenchmark(mock, minerOptions, workDir):
+    with open(os.path.join(workDir, 'projects.csv'), 'w', newline='') as csvOutput:
+        CSVWriter = csv.writer(csvOutput, delimiter=';')
+        for owner, name in mock.repositories:
+            if owner == "mock":
+                CSVWriter.writerow([name, owner + "/" + name])
+    with open(os.path.join(workDir, '.token'), 'w') as tokenFile:
+        tokenFile.write("benchmark-token\n")
+    
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gomine.py'),
+               '-u', 'benchmark', '-i', 'projects.csv', '-o', 'output', '--api', mock.url] + minerOptions
+    mock.resetStats()
+    start = time.time()
+    subprocess.run(command, cwd=workDir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    wallTime = time.time() - start
+    
+    results = {'requests': sum(mock.requests[endpoint] for endpoint in ('repo', 'branches', 'forks', 'commits', 'commit', 'other')),
+               'not_modified': mock.requests['304'],
+               'errors': mock.requests['502'] + mock.requests['403'],
+               'bytes': mock.bytes,
+               'commits_served': mock.numberOfCommits(),
+               'commits_extracted': countCommits(os.path.join(workDir, 'output')),
+               'wall_time_s': round(wallTime, 2)}
+    for endpoint in ('repo', 'branches', 'forks', 'commits', 'commit'):
+        results['requests_' + endpoint] = mock.requests[endpoint]
+    results['requests_per_commit'] = round(results['requests'] / max(results['commits_extracted'], 1), 3)
+    # maxrss is given in kilobytes on Linux
+    results['peak_memory_mb'] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1) if resource else None
+    return results
+
+###################################################################################################################
+# BODY
+###################################################################################################################
+
+# get command line arguments
+try:
+    options, remainder = getopt(argv[1:], 'm:c:kh', ['mineroptions=', 'csv=', 'keep', 'repos=', 'commits=', 'shape=',
+                                                     'forks=', 'forkdepth=', 'forkcommits=', 'branches=', 'files=',
+                                                     'latency=', 'ratelimit=', 'ratewindow=', 'errorrate=',
+                                                     'throttlerate=', 'help'])
+except GetoptError as err:
+    print(str(err))
+    exit(2)
+
+# initialise the parameters to be found in the arguments
+minerOptions = []
+CSVFileReference = ''
+keep = False
+# all parameters of the mock API with their default values (the latency of the benchmark differs from the one
+# of the mock), so that the columns of the CSV file are the same whatever the options given
+parameters = {'repos': 1, 'commits': 1000, 'shape': 'linear', 'mergeEvery': 10, 'forks': 0, 'forkDepth': 1, 'forkCommits': 10,
+              'branches': 1, 'filesPerCommit': 3, 'patchSize': 200, 'authors': 5, 'latency': 0.02, 'rateLimit': 5000,
+              'rateWindow': 3600, 'perPageMax': 100, 'errorRate': 0.0, 'throttleRate': 0.0, 'retryAfter': 1}
+names = {'--repos': 'repos', '--commits': 'commits', '--forks': 'forks', '--forkdepth': 'forkDepth',
+         '--forkcommits': 'forkCommits', '--branches': 'branches', '--files': 'filesPerCommit',
+         '--ratelimit': 'rateLimit', '--ratewindow': 'rateWindow'}
+
+for option, argument in options:
+    if option in ('-m', '--mineroptions'):
+        minerOptions = argument.split()
+    elif option in ('-c', '--csv'):
+        CSVFileReference = argument
+    elif option in ('-k', '--keep'):
+        keep = True
+    elif option in names:
+        parameters[names[option]] = int(argument)
+    elif option == '--shape':
+        parameters['shape'] = argument
+    elif option == '--latency':
+        parameters['latency'] = float(argument)
+    elif option == '--errorrate':
+        parameters['errorRate'] = float(argument)
+    elif option == '--throttlerate':
+        parameters['throttleRate'] = float(argument)
+    elif option in ('-h', '--help'):
+        help()
+
+mock = mockGitHub(**parameters)
+mock.start()
+workDir = tempfile.mkdtemp(prefix='gobenchmark_')
+try:
+    results = runBenchmark(mock, minerOptions, workDir)
+finally:
+    mock.stop()
+    if keep:
+        print("output kept in " + workDir)
+    else:
+        shutil.rmtree(workDir)
+
+print("miner options: " + " ".join(minerOptions))
+for key, value in results.items():
+    print("%-22s %s" % (key, value))
+
+# append the results to the CSV file, so that successive runs can be compared
+if CSVFileReference != '':
+    newFile = not os.path.exists(CSVFileReference)
+    with open(CSVFileReference, 'a', newline='') as csvOutput:
+        CSVWriter = csv.writer(csvOutput, delimiter=';')
+        row = dict(parameters, miner_options=" ".join(minerOptions), **results)
+        if newFile:
+            CSVWriter.writerow(row.keys())
+        CSVWriter.writerow(row.values())
@@ -0,0 +1,167 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+# ---------------------
+# goConvert.py
+# converts commit files produced by goMine.py in the JSON list format (ending with ".commits.json")
+# into the JSON Lines format (ending with ".commits.jsonl", or ".commits.jsonl.gz" if compressed)
+# In compact mode, commit files of any format are rewritten in place with only the fields given in a schema
+# (by default the fields used by goCreateGraphs.py, without patches, see commitSchema.py)
+# Authors: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# PREREQUISITES:
+# ---------------
+# - a directory with json files containing the description of commits as given by the github API.
+#   Files names are formatted as follows <Project>-<GitHubUser>-<GitHubRepo>.commits.json
+#   or <Project>.aggregated.commits.json (in compact mode, also .commits.jsonl and .commits.jsonl.gz)
+#
+# ARGUMENTS:
+# ----------
+# see help() function
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+# standard python libraries
+import os
+import json
+from getopt import getopt, GetoptError
+from sys import stdout, exit, argv
+# own libraries
+from commitFile import commitFile, commitWriter, commitFileExtensions
+from commitSchema import loadSchema, project
+
+#############################################################################################
+# FUNCTION help
+#############################################################################################
+
+def help():
+    print('Required Arguments:')
+    print('-i     --input     <path>    path of the directory where the JSON files are stored')
+    print('Optional Arguments:')
+    print('-o     --output    <path>    path of the directory where the converted files should be stored')
+    print('                             (default: input directory)')
+    print('-z     --gzip                compress the converted files with gzip')
+    print('-r     --rewrite             rewrite mode (rewrites already converted files)')
+    print('-c     --compact             compact mode: rewrites the commit files of any format with only the')
+    print('                             fields given in the schema (compacted files are always rewritten, in')
+    print('                             their format unless -z is given, the original being then removed)')
+    print('-s     --schema    <path>    JSON file describing the commit fields to be kept in compact mode')
+    print('                             (default: the fields used by goCreateGraphs.py, see commitSchema.py)')
+    print('-k     --patches             keep the diff of every file change (\'patch\') in compact mode')
+    print('-h     --help                calls help function')
+    exit()
+
+###################################################################################################################
+# FUNCTION convertCommitFile
+###################################################################################################################
+# rewrites the commits of a commit file into another commit file, record by record.
+# The formats of the files are given by their extensions (see commitFile.py). If a schema is given, only
+# its fields are kept (see commitSchema.py). The input file may be the output file, as the output is 
+# written in a temporary file first. Returns the number of commits.
+
+def convertCommitFile(inputFile, outputFile, schema=True):
+    with commitWriter(outputFile) as writer:
+        for commit in commitFile(inputFile):
+            writer.write(project(commit, schema))
+    return writer.count
+
+###################################################################################################################
+# BODY
+###################################################################################################################
+
+# get command line arguments
+try:
+    options, remainder = getopt(argv[1:], 'i:o:zrcs:kh', ['input=', 'output=', 'gzip', 'rewrite', 'compact', 'schema=',
+                                                         'patches', 'help'])
+except GetoptError as err:
+    print(str(err))
+    exit(2)
+
+# initialise the parameters to be found in the arguments
+inputDir = ''
+outputDir = ''
+outputExtension = '.commits.jsonl'
+compress = False
+rewrite = False
+compact = False
+schemaFile = ''
+keepPatches = False
+
+# search the parameters in the arguments given to the script
+for option, argument in options:
+    if option in ('-i','--input'):
+        inputDir = argument
+    elif option in ('-o','--output'):
+        outputDir = argument
+    elif option in ('-z','--gzip'):
+        outputExtension = '.commits.jsonl.gz'
+        compress = True
+    elif option in ('-r','--rewrite'):
+        rewrite = True
+    elif option in ('-c','--compact'):
+        compact = True
+    elif option in ('-s','--schema'):
+        schemaFile = argument
+    elif option in ('-k','--patches'):
+        keepPatches = True
+    elif option in ('-h','--help'):
+        help()
+
+# check whether all required parameters have been given as arguments and if not throw exception and abort
+if inputDir == '':
+    print("Argument required: input directory. Type '-i <directory path>' in the command line")
+    exit(2)
+if outputDir == '':
+    outputDir = inputDir
+if not os.path.exists(outputDir):
+    os.makedirs(outputDir)
+
+if compact:
+    schema = loadSchema(schemaFile, keepPatches)
+    inputExtensions = commitFileExtensions
+else:
+    schema = True
+    inputExtensions = ['.commits.json']
+
+# list all existing commit files in the input directory. If a commit file exists in several formats,
+# only the first one found in the order of commitFileExtensions is considered
+filesInInputDir = []
+fileNameRoots = set()
+for extension in inputExtensions:
+    for f in sorted(os.listdir(inputDir)):
+        if os.path.isfile(os.path.join(inputDir, f)) and f.endswith(extension) and not f[:-len(extension)] in fileNameRoots:
+            fileNameRoots.add(f[:-len(extension)])
+            filesInInputDir.append((f, extension))
+print(str(len(filesInInputDir)) + ' files found ending with "' + '", "'.join(inputExtensions) + '"')
+
+for (JsonFile,inputExtension),i in zip(filesInInputDir,range(0,len(filesInInputDir))):
+    fileNameRoot = JsonFile[:-len(inputExtension)]
+    # compacted files keep their format, unless they are to be compressed
+    if compact and not compress:
+        outputFile = os.path.join(outputDir, fileNameRoot + inputExtension)
+    else:
+        outputFile = os.path.join(outputDir, fileNameRoot + outputExtension)
+    
+    # processbar
+    stdout.write('\r')
+    stdout.write("[%-30s] %d%%" % ('=' * int(i*30/len(filesInInputDir)+1),  i*100/len(filesInInputDir)+1))
+    stdout.flush()
+    print(" " + fileNameRoot)
+    
+    if rewrite or compact or not os.path.exists(outputFile):
+        try:
+            numberOfCommits = convertCommitFile(os.path.join(inputDir, JsonFile), outputFile, schema)
+            print("\t" + str(numberOfCommits) + " commits written in " + outputFile)
+            # a compacted file written in another format next to the original supersedes it
+            if compact and os.path.abspath(outputFile) != os.path.abspath(os.path.join(inputDir, JsonFile)) \
+                and os.path.abspath(outputDir) == os.path.abspath(inputDir):
+                os.remove(os.path.join(inputDir, JsonFile))
+                print("\tsuperseded file " + JsonFile + " removed")
+        except json.decoder.JSONDecodeError as err:
+            print("error while decoding json from file '" + JsonFile + "'. Error returned: " + str(err))
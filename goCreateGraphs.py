@@ -13,12 +13,21 @@
 # ---------------
 # - a directory with json files containing the description of commits as given by the github API.
 #   Files names are formatted as follows <GitHubUser>-<GitHubRepo>.commits.json
+#   (or manifests <Project>.aggregated.manifest.json, if goMine.py was run with a commit store)
+#   JSON Lines files ending with ".commits.jsonl" or ".commits.jsonl.gz" are read as well
+#   Filtered extracts (see goMine.py) are described in <Project>.extract.json, the description is 
+#   written in the graphs as graph attribute 'extract'
 # - non standard libraries (install with <libraryName>):
 #   . NetworkX (https://networkx.github.io/documentation/stable/reference/index.html)
 #
 # ARGUMENTS:
 # ----------
 # see help() function
+#
+# OUTPUT:
+# -------
+# - GraphML files of the commits, the file changes and the committers of each project
+# - the identities of the contributors of each project in <Project>.identities.json (see identityResolver.py)
 
 #############################################################################################
 # HEADER
@@ -35,8 +44,14 @@ from getopt import getopt, GetoptError
 import networkx as nx
 import numpy as np
 from collections import Counter
+from bisect import bisect_left
 from sys import stdout, exit, argv
 from datetime import datetime, date
+# own libraries
+from commitStore import commitStore
+from commitFile import commitFile, commitFileExtensions
+from identityResolver import identityResolver, identityColor
+from renameLineage import renameLineage, changeDate
 
 #############################################################################################
 # FUNCTION help
@@ -51,6 +66,8 @@ def help():
     print('-s     --selfloop            create committergraph with selfloops')
     print('-m     --mode                directed or unidirected committergraph (init is unidirected) ')
     print('-d     --debug               switchs into Debug mode')
+    print('-t     --store <path>        directory of the commit store (reads manifests instead of commit files)')
+    print('-x     --categories <path>   JSON file of additional categories of files {"<name>": [".<extension>", ...]}')
     print('-c     --clearscreen         clears the terminal before starting the execution of the script')
     print('-h     --help                calls help function')
     exit()
@@ -59,63 +76,19 @@ def help():
 # FUNCTION exportCommitGraph
 ###################################################################################################################
 
-def exportCommitGraph(commits):
+def exportCommitGraph(commits, identities=None):
 
-    # dict for all possible git names
-    committer = {'author_name':[],
-                'author_email': [],
-                'author_login': [],
-                'committer_name': [],
-                'committer_email': [],
-                'committer_login': [],
-                'color':[]
-                }
+    # identities of the contributors, merging the names, emails and logins they used (see identityResolver.py)
+    if identities is None:
+        identities = identityResolver(commits)
 
     G = nx.DiGraph()
     
     for commit in commits:
 
-        # init name for all commits
-        author_name = commit['commit']['author']['name']
-       
-        # check if init name appeared in one of the name forms already
-        # if not, create new dict entrie with all name forms and define new color
-        # TODO write shorter
-        if author_name not in [x for v in committer.values() for x in v] and commit['commit']['committer']['email'] not in [x for v in committer.values() for x in v] and committer['author_login'] not in [x for v in committer.values() for x in v] and committer['committer_name'] not in [x for v in committer.values() for x in v] and committer['committer_login'] not in [x for v in committer.values() for x in v] and committer['committer_email'] not in [x for v in committer.values() for x in v]:
-            committer['author_name'].append(commit['commit']['author']['name'])
-            committer['author_email'].append(commit['commit']['author']['email'])
-            try:
-                committer['author_login'].append(commit['author']['login'])
-            except:
-                committer['author_login'].append('')
-            committer['committer_name'].append(commit['commit']['committer']['name'])
-            try:
-                committer['committer_login'].append(commit['committer']['login'])
-            except:
-                committer['committer_login'].append('')
-            committer['committer_email'].append(commit['commit']['committer']['email'])
-            committer_color = getRandomColor()
-            committer['color'].append(committer_color)
-            
-        #if name appeared already, find previeous used name and color
-        else:
-            for key in committer.keys():
-                if author_name in committer[key]:
-                    committer_color = committer['color'][committer[key].index(author_name)]
-                    author_name = committer['author_name'][committer[key].index(author_name)]
-                    break
-                elif commit['commit']['author']['email'] in committer[key]:
-                    committer_color = committer['color'][committer[key].index(commit['commit']['author']['email'])]
-                    author_name = committer['author_name'][committer[key].index(commit['commit']['author']['email'])]
-                    break
-                elif commit['commit']['committer']['name'] in committer[key]:
-                    committer_color = committer['color'][committer[key].index(commit['commit']['committer']['name'])]
-                    author_name = committer['author_name'][committer[key].index(commit['commit']['committer']['name'])]
-                    break
-                elif commit['commit']['committer']['email'] in committer[key]:
-                    committer_color = committer['color'][committer[key].index(commit['commit']['committer']['email'])]
-                    author_name = committer['author_name'][committer[key].index(commit['commit']['committer']['email'])]
-                    break
+        # name and color of the identity of the author
+        author_name, committer_color = identities.resolve(commit)
+
         if 'stats' in commit: 
             changes = str(commit['stats']['total'])
         else:
@@ -137,94 +110,69 @@ def exportCommitGraph(commits):
     return G
 
 ###################################################################################################################
-# FUNCTION exportFileGraph
+# FUNCTION extensionCategories
+###################################################################################################################
+# returns the categories of files in which each file extension is classified, as a dict extension -> tuple of
+# category names, and the tuple of the categories without filter (i.e. classifying all extensions)
+# Parameter 'categories' -> list of (category name, list of extensions), an empty list meaning all extensions
+
+def extensionCategories(categories):
+    extensions = {}
+    unfiltered = tuple(name for name, filter in categories if filter == [])
+    for name, filter in categories:
+        for extension in set(extension.lower() for extension in filter):
+            extensions[extension] = extensions.get(extension, ()) + (name,)
+    return extensions, unfiltered
+
 ###################################################################################################################
+# FUNCTION exportFileGraphs
+###################################################################################################################
+# Create and return the file change graphs of several categories of files in one pass over the commits, as a dict
+# category name -> graph, and the list of error messages. Every file change is classified once by its extension
+# (see extensionCategories). The extensions omitted by a category are counted in 'omittedExtensions'
 
-def exportFileGraph(commits, filter=[]):
+def exportFileGraphs(commits, categories, identities=None, lineage=None):
 
-    G = nx.DiGraph()
+    graphs = {name: nx.DiGraph() for name, filter in categories}
     
-    nodeList = []
+    # history of every file in every category, built while reading the commits: category name -> filename ->
+    # list of changes (author date, committer date, sha, status)
+    fileHistories = {name: {} for name, filter in categories}
     errorMess = []
 
-    # dict for all possible git names
-    committer = {'author_name':[],
-                'author_email': [],
-                'author_login': [],
-                'committer_name': [],
-                'committer_email': [],
-                'committer_login': [],
-                'color':[]
-                }
+    extensions, unfiltered = extensionCategories(categories)
+    filtered = len(categories) - len(unfiltered)
+
+    # identities of the contributors, merging the names, emails and logins they used (see identityResolver.py)
+    if identities is None:
+        identities = identityResolver(commits)
+    # renames of the files of the project (see renameLineage.py)
+    if lineage is None:
+        lineage = renameLineage(commits)
 
     for commit in commits:
         if 'files' in commit:
-            for file in commit['files']:
 
-                _, file_extension = os.path.splitext(file['filename'].lower())
+            # name and color of the identity of the author
+            author_name, committer_color = identities.resolve(commit)
+            date = changeDate(commit)
 
-                #TODO OTHER extensions
-                if (file_extension in filter) or filter == []:
-                    
-                    # init name for all commits
-                    author_name = commit['commit']['author']['name']
-               
-                    # check if init name appeared in one of the name forms already
-                    # if not, create new dict entrie with all name forms and define new color
-                    # TODO write shorter
-                    if author_name not in [x for v in committer.values() for x in v] \
-                        and commit['commit']['committer']['email'] not in [x for v in committer.values() for x in v] \
-                        and committer['author_login'] not in [x for v in committer.values() for x in v] \
-                        and committer['committer_name'] not in [x for v in committer.values() for x in v] \
-                        and committer['committer_login'] not in [x for v in committer.values() for x in v] \
-                        and committer['committer_email'] not in [x for v in committer.values() for x in v]:
-                        
-                        committer['author_name'].append(commit['commit']['author']['name'])
-                        committer['author_email'].append(commit['commit']['author']['email'])
-                        try:
-                            committer['author_login'].append(commit['author']['login'])
-                        except:
-                            committer['author_login'].append('')
-                        committer['committer_name'].append(commit['commit']['committer']['name'])
-                        try:
-                            committer['committer_login'].append(commit['committer']['login'])
-                        except:
-                            committer['committer_login'].append('')
-                        committer['committer_email'].append(commit['commit']['committer']['email'])
-                        committer_color = getRandomColor()
-                        committer['color'].append(committer_color)
-                        
-                    #if name appeared already, find previeous used name and color
-                    else:
-                        for key in committer.keys():
-                            if author_name in committer[key]:
-                                committer_color = committer['color'][committer[key].index(author_name)]
-                                author_name = committer['author_name'][committer[key].index(author_name)]
-                                break
-                            elif commit['commit']['author']['email'] in committer[key]:
-                                committer_color = committer['color'][committer[key].index(commit['commit']['author']['email'])]
-                                author_name = committer['author_name'][committer[key].index(commit['commit']['author']['email'])]
-                                break
-                            elif commit['commit']['committer']['name'] in committer[key]:
-                                committer_color = committer['color'][committer[key].index(commit['commit']['committer']['name'])]
-                                author_name = committer['author_name'][committer[key].index(commit['commit']['committer']['name'])]
-                                break
-                            elif commit['commit']['committer']['email'] in committer[key]:
-                                committer_color = committer['color'][committer[key].index(commit['commit']['committer']['email'])]
-                                author_name = committer['author_name'][committer[key].index(commit['commit']['committer']['email'])]
-                                break
-                    
-
-                    if 'previous_filename' in file:
-                        previous_filename = file['previous_filename']
-                    else:
-                        previous_filename = None
+            for file in commit['files']:
 
-                    nodeList.append([file['filename'], commit['sha'], file['status'],
-                                     commit['commit']['author']['date'],previous_filename])
+                _, file_extension = os.path.splitext(file['filename'].lower())
+                matchingCategories = extensions.get(file_extension, ())
+                
+                if len(matchingCategories) < filtered:
+                    omittedExtensions[file_extension] = omittedExtensions.get(file_extension, 0) + filtered - len(matchingCategories)
+                fileCategories = unfiltered + matchingCategories
+
+                node = nodeName(file['filename'], commit['sha'])
+                change = date + (commit['sha'], file['status'])
+                for name in fileCategories:
+                    fileHistories[name].setdefault(file['filename'], []).append(change)
                     
                     # Create new node for every file
-                    G.add_node(nodeName(file['filename'], commit['sha']),
+                    graphs[name].add_node(node,
                                sha_commit=commit['sha'],
                                committer=author_name,
                                date=commit['commit']['committer']['date'],
@@ -233,88 +181,58 @@ def exportFileGraph(commits, filter=[]):
                                filename=file['filename'],
                                color=committer_color
                                )
-                               
-                elif not file_extension in filter and len(filter)is not 0:
-                    if file_extension in omittedExtensions.keys():
-                        omittedExtensions[file_extension] += 1
-                    else:
-                        omittedExtensions[file_extension] = 1
                         
         else:
             errorMess.append("commit " + commit['sha'] + " has no attribute 'files'. See " + commit['commit']['url'])
     
-    ######## Convert list in multiple sublists
-    c = Counter(elem[0] for elem in nodeList)
-
-    sub_lists = ([[k, 4*[1], 1, 1, 1] * v for k, v in c.items()])
-
-    for elem in sub_lists:
-
-        counter = len(elem)
-        index = 0
-
-        for nodes in nodeList:
-
-            if nodes[0] == elem[0]:
-                elem[index + 1] = nodes[1]
-                elem[index + 2] = nodes[2]
-                elem[index + 3] = nodes[3]
-                elem[index + 4] = nodes[4]
-
-                # del nodeList[nodeList.index(nodes)]
-                if counter - 6 < index:
-                    break
-                else:
-                    index += 5
-
-    ########
-    
-    for elem in sub_lists:
-
-        for i in elem[3::5]:
-            elem[elem.index(i)] = datetime.strptime(str(i), '%Y-%m-%dT%H:%M:%SZ')
-
-        datelist = sorted(elem[3::5])
-
-        for i in range(len(datelist)-1):
-
-                older_sha = elem[elem.index(datelist[i])-2]
-                newer_sha = elem[elem.index(datelist[i+1])-2]
-                
-                filename = elem[0]
-                
-                parent_node = nodeName(filename, older_sha)
-                child_node = nodeName(filename, newer_sha)
+    for name, filter in categories:
+        linkFileHistory(graphs[name], fileHistories[name], lineage)
                 
-                # TODO: check why?
-                if parent_node != child_node:
-                    G.add_edge(parent_node, child_node)
+    return graphs, errorMess
 
-                ## Check if status is renamed. If true then get the previews filename and search for it in
-                #  in the sublists of commits
-                
-                status = elem[elem.index(datelist[i])-1]
-                
-                if status == 'renamed':
+###################################################################################################################
+# FUNCTION exportFileGraph
+###################################################################################################################
+# Create and return the file change graph of the files whose extension is in 'filter' (all files if empty)
 
-                    for sub_elem in sub_lists:
-                        filename_sublist = sub_elem[0]
-                        filename_root = elem[elem.index(datelist[i])+1]
-                        
-                        if filename_sublist == filename_root:
+def exportFileGraph(commits, filter=[], identities=None, lineage=None):
+    graphs, errorMess = exportFileGraphs(commits, [('', filter)], identities, lineage)
+    return graphs[''], errorMess
 
-                            sub_datelist = sorted(sub_elem[3::5])
+###################################################################################################################
+# FUNCTION linkFileHistory
+###################################################################################################################
 
-                            child_node = nodeName(filename_sublist,
-                                                   elem[elem.index(datelist[i])-2])
-                            parent_node = nodeName(filename_root,
-                                                  sub_elem[sub_elem.index(sub_datelist[len(sub_datelist)-1])-2])
-                            
-                            if parent_node != child_node and child_node in [k[1] for k in nodeList]:
-                                    G.add_edge(parent_node, child_node)    
+def linkFileHistory(G, fileHistory, lineage):
+
+    # sort the changes of every file once by date (changes with the same author date, e.g. rebased
+    # commits, are sorted by committer date)
+    for changes in fileHistory.values():
+        changes.sort(key=lambda change: change[:2])
+
+    # link every change of a file to its previous change. The previous change of a renamed file is the
+    # last change of the file under its previous path. Previous paths missing in the graph (e.g. because
+    # of the filter) are skipped by following the lineage further back
+    dates = {filename: [change[:2] for change in changes] for filename, changes in fileHistory.items()}
+    for filename, changes in fileHistory.items():
+        for index, change in enumerate(changes):
+
+            parent_node = None
+            child_node = nodeName(filename, change[2])
+
+            if change[3] == 'renamed':
+                for previous_filename, renamed_date in lineage.ancestors(filename, change[2]):
+                    previous_index = bisect_left(dates.get(previous_filename, []), renamed_date)
+                    if previous_index > 0:
+                        parent_node = nodeName(previous_filename, fileHistory[previous_filename][previous_index-1][2])
+                        break
+            if parent_node is None and index > 0:
+                parent_node = nodeName(filename, changes[index-1][2])
+            
+            # a commit listing a file twice gives the same node twice
+            if parent_node is not None and parent_node != child_node:
+                G.add_edge(parent_node, child_node)
                 
-    return G, errorMess
-    
 
 ###################################################################################################################
 # FUNCTION exportCommitterGraph
@@ -325,28 +243,25 @@ def exportFileGraph(commits, filter=[]):
 
 def exportCommitterGraph(fileGraph,selfloop=False, directed=False):
     
-    # get data from fileGraph in list
-    G_list = fileGraph.nodes(data=True)
+    # get list with all authors, every author being identified by its index in the list
+    committers = [data['committer'] for node, data in fileGraph.nodes(data=True)]
+    authors = sorted(set(committers))
+    authorIds = {author: index for index, author in enumerate(authors)}
+    nodeAuthors = {node: authorIds[data['committer']] for node, data in fileGraph.nodes(data=True)}
     
-    # get list with all authors
-    authors = list(set([i[1]['committer'] for i in G_list]))
+    filechanges = Counter(committers)
     
-    filechanges = Counter(list(([i[1]['committer'] for i in G_list])))
+    # sparse matrix of the connections between authors, as the coordinates (parent author, child author) of its
+    # non-zero cells and their values: the number of edges (sha_parent, sha_child) of the file graph linking a
+    # change of the parent author to a change of the child author
+    parents = np.fromiter((nodeAuthors[edge[0]] for edge in fileGraph.edges()), dtype=np.int64, count=fileGraph.number_of_edges())
+    children = np.fromiter((nodeAuthors[edge[1]] for edge in fileGraph.edges()), dtype=np.int64, count=fileGraph.number_of_edges())
+    cells, counts = np.unique(parents * len(authors) + children, return_counts=True)
+    rows, columns = np.divmod(cells, max(1, len(authors)))
     
-    # init matrix with zeros (DIM: # authors, # authors)
-    arr = np.zeros((len(authors),len(authors)))
+    # number of connections of every author as parent (sum of the row of the author)
+    connections = np.bincount(rows, weights=counts, minlength=len(authors))
 
-    # get list with all edges (sha_parent, sha_child) and loop all edges
-    for edge in [i for i in fileGraph.edges()]:
-        
-        # get author name from parent node via sha
-        author_parent = [j[1]['committer'] for j in G_list][list(fileGraph.nodes()).index(edge[0])]
-        # get author name from child node via sha
-        author_child = [j[1]['committer'] for j in G_list][list(fileGraph.nodes()).index(edge[1])]
-        
-        # count +1 for existing connection between two authors
-        arr[authors.index(author_parent)][authors.index(author_child)] += 1 
-    
     # create directed graph
     if directed:
 
@@ -359,31 +274,26 @@ def exportCommitterGraph(fileGraph,selfloop=False, directed=False):
             G_committer.add_node(author,
                         author=author,
                         filechanges = filechanges[author],
-                        surface = str(10*math.sqrt((np.sum(arr[authors.index(author)])))),
-                        color = getRandomColor()
+                        surface = str(10*math.sqrt(connections[authorIds[author]])),
+                        color = identityColor(author)
                         )
         
-        for i, row in enumerate(arr):
-            for j, column in enumerate(row):
-                # connect nodes if the authors have a connection 
-                # don't make a connection to the same node (can be changed)
-                if not i==j and column != 0 and selfloop is False:
-                    G_committer.add_edge(authors[i], authors[j], weight = (str(column)))
-                elif column != 0 and selfloop is True:
-                    G_committer.add_edge(authors[i], authors[j], weight = (str(column)))
+        # connect nodes if the authors have a connection 
+        # don't make a connection to the same node (can be changed)
+        if not selfloop:
+            rows, columns, counts = rows[rows != columns], columns[rows != columns], counts[rows != columns]
+        for i, j, count in zip(rows.tolist(), columns.tolist(), counts.tolist()):
+            G_committer.add_edge(authors[i], authors[j], weight = str(float(count)))
     # create unidirected graph (init)
     else:
         G_committer = nx.Graph()
         
-        upper_matix= np.triu(arr)
-        lower_matix= np.tril(arr,-1)
-
-        
-        for i, row in enumerate(arr):
-                for j, column in enumerate(row):
-                    upper_matix[i,j] += lower_matix[j,i]
-                    if i==j and selfloop is False:
-                        upper_matix[i,j]=0
+        # fold the matrix on its diagonal: the connections from j to i are added to the connections from i to j (i < j)
+        folded, inverse = np.unique(np.minimum(rows, columns) * len(authors) + np.maximum(rows, columns), return_inverse=True)
+        foldedCounts = np.bincount(inverse, weights=counts, minlength=len(folded)).astype(np.int64)
+        rows, columns = np.divmod(folded, max(1, len(authors)))
+        if not selfloop:
+            rows, columns, foldedCounts = rows[rows != columns], columns[rows != columns], foldedCounts[rows != columns]
             
         # loop to create all nodes (1 node per author)
         for author in authors:
@@ -391,32 +301,29 @@ def exportCommitterGraph(fileGraph,selfloop=False, directed=False):
             G_committer.add_node(author,
                         author=author,
                         filechanges = filechanges[author],
-                        surface = str(10*math.sqrt((np.sum(arr[authors.index(author)])))),
-                        color = getRandomColor()
+                        surface = str(10*math.sqrt(connections[authorIds[author]])),
+                        color = identityColor(author)
                         )
 
-        for i, row in enumerate(upper_matix):
-            for j, column in enumerate(row):
-                # connect nodes if the authors have a connection 
-                # don't make a connection to the same node (can be changed)
-                if column != 0:
-                    G_committer.add_edge(authors[i], authors[j], weight = int(column))
+        # connect nodes if the authors have a connection 
+        for i, j, count in zip(rows.tolist(), columns.tolist(), foldedCounts.tolist()):
+            G_committer.add_edge(authors[i], authors[j], weight = count)
 
 
     # return graph
     return G_committer
 
 ###################################################################################################################
-# FUNCTION getRandomColor
+# FUNCTION writeGraph
 ###################################################################################################################
-# return a random color with r,g,b values
+# writes a graph in a GraphML file. Graphs built from a filtered extract (see goMine.py) carry the description 
+# of the filters as graph attribute 'extract', since they do not represent the complete history of the project
+
+def writeGraph(G, graphmlFile, extract=None):
+    if extract is not None:
+        G.graph['extract'] = json.dumps(extract)
+    nx.write_graphml(G, graphmlFile)
 
-def getRandomColor():
-    r = lambda: random.randint(90, 255)
-    g = lambda: random.randint(90, 255)
-    b = lambda: random.randint(90, 255)
-    return '#%02X%02X%02X' % (r(), g(), b())
-    
 ###################################################################################################################
 # FUNCTION nodeName
 ###################################################################################################################
@@ -451,14 +358,18 @@ PHW_ext = MCAD_ext + ECAD_ext + IMGS_ext + DOCS_ext
 # file extensions *certainly* coming into play in hardware development
 CHW_ext = MCAD_ext + ECAD_ext
 
+# categories of files for which file change graphs and committer graphs are built, an empty list of extensions
+# standing for all files. Additional categories can be given in a JSON file (see help())
+graphCategories = [('ALL', []), ('PHW', PHW_ext), ('CHW', CHW_ext)]
+
 global omittedExtensions
 omittedExtensions = {} 
    
 
 # get command line arguments
 try:
-    options, remainder = getopt(argv[1:], 'i:o:rdchsm', ['input=', 'output=','rewrite','debug', 'clearscreen',
-                                                    'help','selfloop','mode'])
+    options, remainder = getopt(argv[1:], 'i:o:rdchsmt:x:', ['input=', 'output=','rewrite','debug', 'clearscreen',
+                                                    'help','selfloop','mode','store=','categories='])
 except GetoptError as err:
     print(str(err))
     exit(2)
@@ -471,6 +382,8 @@ clearscreen = False
 selfloop = False
 mode = False
 debug = False
+storeDir = ''
+categoryFile = ''
 
 # search the parameters in the arguments given to the script
 for option, argument in options:
@@ -490,6 +403,10 @@ for option, argument in options:
         mode = True
     elif option  in ("-c", "--clearscreen"):
         clearscreen = True
+    elif option  in ("-t", "--store"):
+        storeDir = argument
+    elif option  in ("-x", "--categories"):
+        categoryFile = argument
        
 # check whether all required parameters have been given as arguments and if not throw exception and abort
 if inputDir == '':
@@ -499,18 +416,37 @@ if outputDir == '':
     print("Argument required: output directory. Type '-o <directory path>' in the command line")
     exit(2)
     
+# additional categories of files, given as a JSON object {"<category name>": [".<extension>", ...]}
+if categoryFile != '':
+    with open(categoryFile) as json_file:
+        for name, extensions in json.load(json_file).items():
+            graphCategories.append((name, [extension.lower() for extension in extensions]))
+    print("categories of files: " + ", ".join(name for name, extensions in graphCategories))
+    
 # execute options chosen by the user
 if clearscreen:
     os.system('cls')
 if rewrite:
     print ("*executing the script in rewrite mode*")
 
-# list all existing files in the input directory ending with ".commits.json"
-print('search for files ending with ".aggregated.commits.json" in "' + inputDir + '"')
-filesInInputDir = [f for f in os.listdir(inputDir) if os.path.isfile(os.path.join(inputDir, f)) and f.endswith('.aggregated.commits.json')]
+# list all existing files in the input directory ending with ".commits.json" (or ".manifest.json" in store mode)
+store = None
+inputExtensions = ['.aggregated' + extension for extension in commitFileExtensions]
+if storeDir != '':
+    store = commitStore(storeDir)
+    inputExtensions = ['.aggregated.manifest.json']
+print('search for files ending with "' + '", "'.join(inputExtensions) + '" in "' + inputDir + '"')
+# if the commits of a project exist in several formats, only the first one found in the order of commitFileExtensions is considered
+filesInInputDir = []
+fileNameRoots = set()
+for extension in inputExtensions:
+    for f in sorted(os.listdir(inputDir)):
+        if os.path.isfile(os.path.join(inputDir, f)) and f.endswith(extension) and not f[:-len(extension)] in fileNameRoots:
+            fileNameRoots.add(f[:-len(extension)])
+            filesInInputDir.append(f)
 numberOfFilesFound = len(filesInInputDir)
 if numberOfFilesFound == 0 :
-    print('no file ending with ".aggregated.commits.json" found in this ' + filesInInputDir + '"')
+    print('no file ending with "' + '", "'.join(inputExtensions) + '" found in "' + inputDir + '"')
     exit(2)
 else:
     print (str(numberOfFilesFound) + " files found")
@@ -521,11 +457,9 @@ if not os.path.exists(outputDir):
     
 #build graphs for all variations for all JSON files
 for JsonFile,i in zip(filesInInputDir,range(0,len(filesInInputDir))):
-    fileNameRoot = os.path.splitext(os.path.splitext(os.path.splitext(JsonFile)[0])[0])[0] # to remove '.aggregated.commits.json'
+    fileNameRoot = JsonFile[:JsonFile.index('.aggregated.')] # to remove '.aggregated.commits.json'
     commitGraph = None
-    fileGraphALL = None
-    fileGraphPHW = None
-    fileGraphCHW = None
+    fileGraphs = {}
     
 	# processbar
     stdout.write('\r')
@@ -533,64 +467,54 @@ for JsonFile,i in zip(filesInInputDir,range(0,len(filesInInputDir))):
     stdout.flush()
     print(" " + fileNameRoot)
 	
-    # get the list of commits from the JSON file
+    # get the commits from the JSON file, they are streamed from the file each time they are iterated
+    commits = commitFile(os.path.join(inputDir,JsonFile), store)
+    # a filtered extract does not hold the complete history of the project
+    extract = None
+    if os.path.exists(os.path.join(inputDir, fileNameRoot + ".extract.json")):
+        with open(os.path.join(inputDir, fileNameRoot + ".extract.json")) as json_file:
+            extract = json.load(json_file)
+        print("\tfiltered extract: since '" + extract['since'] + "', until '" + extract['until'] + "', paths " 
+              + str(extract['paths']) + ", extensions " + str(extract['extensions']))
     try:
-        with open(os.path.join(inputDir,JsonFile)) as json_file:
-            commits = json.load(json_file)
-    except json.decoder.JSONDecodeError as err:
-        print("error while decoding json from file '" + JsonFile + "'. Error returned: " + str(err))
-    
-    # 1 - commit graph
-    graphmlFile = os.path.join(outputDir, fileNameRoot+".commits.ALL.graphml")
-    if rewrite or not os.path.exists(graphmlFile):
-        commitGraph = exportCommitGraph(commits)
-        nx.write_graphml(commitGraph, graphmlFile)                
-    
-    # 2.1 - filechange graph - ALL
-    graphmlFile = os.path.join(outputDir, fileNameRoot +".filechanges.ALL.graphml")
-    if rewrite or not os.path.exists(graphmlFile):
-        fileGraphALL, errorMess = exportFileGraph(commits)
-        if debug:
-            for mess in errorMess:
-                print(mess)
-        nx.write_graphml(fileGraphALL, graphmlFile)    
-    
+        # 0 - identities of the contributors and renames of the files, resolved once and shared by all graphs.
+        # Identities saved in a previous run (possibly edited by hand) are kept, except in rewrite mode
+        identityFile = os.path.join(outputDir, fileNameRoot + ".identities.json")
+        identities = identityResolver()
+        if not rewrite and os.path.exists(identityFile):
+            identities.load(identityFile)
+        lineage = renameLineage()
+        for commit in commits:
+            identities.addCommit(commit)
+            lineage.addCommit(commit)
+        identities.save(identityFile)
+        # the weights of the commit graph are random, they are drawn from a generator seeded with the name
+        # of the project so that repeated runs give identical graphs
+        random.seed(fileNameRoot)
+        
+        # 1 - commit graph
+        graphmlFile = os.path.join(outputDir, fileNameRoot+".commits.ALL.graphml")
+        if rewrite or not os.path.exists(graphmlFile):
+            commitGraph = exportCommitGraph(commits, identities)
+            writeGraph(commitGraph, graphmlFile, extract)                
     
-    # 2.2 - filechange graph - PHW
-    graphmlFile = os.path.join(outputDir, fileNameRoot +".filechanges.PHW.graphml")
-    if rewrite or not os.path.exists(graphmlFile):
-        fileGraphPHW, errorMess = exportFileGraph(commits, PHW_ext)
-        if debug:
-            for mess in errorMess:
-                print(mess)
-        nx.write_graphml(fileGraphPHW, graphmlFile)                
-
-    # 2.3 - filechange graph - CHW
-    graphmlFile = os.path.join(outputDir, fileNameRoot +".filechanges.CHW.graphml")
-    if rewrite or not os.path.exists(graphmlFile):
-        fileGraphCHW, errorMess = exportFileGraph(commits, CHW_ext)
-        if debug:
-            for mess in errorMess:
-                print(mess)
-        nx.write_graphml(fileGraphCHW, graphmlFile)                
+        # 2 - filechange graphs of all categories, built in one pass over the commits
+        missingCategories = [(name, extensions) for name, extensions in graphCategories 
+                             if rewrite or not os.path.exists(os.path.join(outputDir, fileNameRoot + ".filechanges." + name + ".graphml"))]
+        if missingCategories != []:
+            fileGraphs, errorMess = exportFileGraphs(commits, missingCategories, identities, lineage)
+            if debug:
+                for mess in errorMess:
+                    print(mess)
+            for name, fileGraph in fileGraphs.items():
+                writeGraph(fileGraph, os.path.join(outputDir, fileNameRoot + ".filechanges." + name + ".graphml"), extract)
     
-    # 3.1 - committer graph - ALL
-    graphmlFile = os.path.join(outputDir, fileNameRoot +".committers.ALL.graphml")
-    if rewrite or not os.path.exists(graphmlFile):
-        if fileGraphALL == None:
-            fileGraphALL = nx.read_graphml(os.path.join(outputDir, fileNameRoot+".filechanges.ALL.graphml"))
-        nx.write_graphml(exportCommitterGraph(fileGraphALL, selfloop, mode), graphmlFile) 
-
-    # 3.2 - committer graph - PHW
-    graphmlFile = os.path.join(outputDir, fileNameRoot +".committers.PHW.graphml")
-    if rewrite or not os.path.exists(graphmlFile):
-        if fileGraphPHW == None:
-            fileGraphPHW = nx.read_graphml(os.path.join(outputDir, fileNameRoot +".filechanges.PHW.graphml"))
-        nx.write_graphml(exportCommitterGraph(fileGraphPHW,selfloop, mode), graphmlFile)                
-
-    # 3.3 - committer graph - CHW
-    graphmlFile = os.path.join(outputDir, fileNameRoot +".committers.CHW.graphml")
-    if rewrite or not os.path.exists(graphmlFile):
-        if fileGraphCHW == None:
-            fileGraphCHW = nx.read_graphml(os.path.join(outputDir, fileNameRoot +".filechanges.CHW.graphml"))
-        nx.write_graphml(exportCommitterGraph(fileGraphCHW,selfloop, mode), graphmlFile)                    
\ No newline at end of file
+        # 3 - committer graphs of all categories
+        for name, extensions in graphCategories:
+            graphmlFile = os.path.join(outputDir, fileNameRoot + ".committers." + name + ".graphml")
+            if rewrite or not os.path.exists(graphmlFile):
+                if not name in fileGraphs:
+                    fileGraphs[name] = nx.read_graphml(os.path.join(outputDir, fileNameRoot + ".filechanges." + name + ".graphml"))
+                writeGraph(exportCommitterGraph(fileGraphs[name], selfloop, mode), graphmlFile, extract)
+    except json.decoder.JSONDecodeError as err:
+        print("error while decoding json from file '" + JsonFile + "'. Error returned: " + str(err))
@@ -0,0 +1,306 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+# ---------------------
+# goImport.py
+# extracts the commits of a list of repositories from local archives of GitHub events or commits
+# (newline-delimited JSON, e.g. the hourly files of GH Archive https://www.gharchive.org) and saves
+# them in commit files as produced by goMine.py, without any request to the GitHub API
+# Authors: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# PREREQUISITES:
+# ---------------
+# - a directory with archive files, one JSON object per line, optionally compressed with gzip
+#   (files ending with ".json", ".jsonl", ".ndjson", optionally followed by ".gz"). A line is either
+#   . an event of type 'PushEvent' as delivered by the GitHub events API (GH Archive format): the
+#     commits of the push are taken from its payload
+#   . a commit in the format of the GitHub API (e.g. a line of a commit file of goMine.py): the
+#     repository is taken from its url (.../repos/<owner>/<repo>/commits/<sha>)
+# - a CSV file containing a list of repositories, formatted as for goMine.py
+#
+# Events only give an excerpt of the commits: sha, author name and email, message, and the date of
+# the push as date. The file changes are not known ('files' is empty) and the parents are derived from
+# the order of the commits in the push (the first commit having the head before the push as parent,
+# unless the push has been truncated to its first commits). Commits delivered in the format of the
+# GitHub API are kept as they are (reduced to the fields of the schema, see commitSchema.py).
+# Each commit is saved once per project: in the file of the first repository of the project in which
+# it was found, as goMine.py does.
+#
+# The archive files are decompressed and parsed in parallel by a pool of processes. Each process
+# writes the commits found in a file in temporary files (one per repository), which are then merged
+# into the commit files, so that the commits are never held in memory.
+#
+# ARGUMENTS:
+# ----------
+# see help() function
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+# standard python libraries
+import os
+import re
+import csv
+import json
+import shutil
+import tempfile
+import multiprocessing
+from getopt import getopt, GetoptError
+from sys import stdout, exit, argv
+# own libraries
+from commitFile import commitFile, commitChain, commitWriter, openText
+from commitSchema import loadSchema, project
+
+# extensions of the archive files
+archiveExtensions = ('.json', '.jsonl', '.ndjson', '.json.gz', '.jsonl.gz', '.ndjson.gz')
+
+#############################################################################################
+# FUNCTION help
+#############################################################################################
+
+def help():
+    print('Required Arguments:')
+    print('-a     --archives  <path>    path of the directory where the archive files are stored')
+    print('-i     --input     <path>    input CSV file')
+    print('-o     --output    <path>    path of the directory where the commit files should be stored')
+    print('Optional Arguments:')
+    print('-n     --processes <n>       number of archive files parsed in parallel (default: number of CPUs)')
+    print('-j     --jsonl               write commit files in the JSON Lines format (one commit per line)')
+    print('-z     --gzip                write commit files in the JSON Lines format compressed with gzip')
+    print('-s     --schema    <path>    JSON file describing the commit fields to be kept (see commitSchema.py)')
+    print('-k     --patches             keep the diff of every file change (\'patch\') in the commits')
+    print('-r     --rewrite             rewrite mode (rewrites already imported projects)')
+    print('       --api <url>           root URL of the GitHub API used in the urls of the commits')
+    print('                             (default: https://api.github.com)')
+    print('-h     --help                calls help function')
+    exit()
+
+###################################################################################################################
+# FUNCTION pushCommits
+###################################################################################################################
+# returns the commits of a push event in the format of the GitHub API
+
+def pushCommits(event, commitUrlRoot):
+    payload = event.get('payload') or {}
+    commits = payload.get('commits') or []
+    # the payload only lists the first 20 commits of large pushes: the parent of the first one is then unknown
+    previous = payload.get('before') if payload.get('size', len(commits)) == len(commits) else None
+    for pushCommit in commits:
+        author = pushCommit.get('author') or {}
+        person = {'name': author.get('name', ''), 'email': author.get('email', ''), 'date': event.get('created_at')}
+        parents = []
+        if previous is not None and previous.strip('0') != '':
+            parents.append({'sha': previous, 'url': commitUrlRoot + "/" + previous})
+        yield {'sha': pushCommit['sha'],
+               'url': commitUrlRoot + "/" + pushCommit['sha'],
+               'commit': {'author': person, 'committer': person, 'message': pushCommit.get('message', ''),
+                          'url': pushCommit.get('url', '')},
+               'author': None,
+               'committer': None,
+               'parents': parents,
+               'stats': {'total': 0, 'additions': 0, 'deletions': 0},
+               'files': []}
+        previous = pushCommit['sha']
+
+###################################################################################################################
+# FUNCTION scanArchive
+###################################################################################################################
+# parses an archive file line per line and writes the commits of the searched repositories in temporary
+# files <tmpDir>/<repository number>/<archive number>.jsonl. Runs in the processes of the pool: the
+# searched repositories, the schema and the temporary directory are given once by initialiseScan.
+# Returns the number of lines and the number of commits found.
+
+def initialiseScan(searchedRepositories, commitSchema, temporaryDirectory, commitUrl):
+    global repositories, schema, tmpDir, apiUrl
+    repositories = searchedRepositories
+    schema = commitSchema
+    tmpDir = temporaryDirectory
+    apiUrl = commitUrl
+
+def scanArchive(task):
+    archiveNumber, archiveFile = task
+    numberOfLines = 0
+    numberOfCommits = 0
+    partFiles = {}
+    try:
+        with openText(archiveFile, 'r') as archive:
+            for line in archive:
+                numberOfLines += 1
+                # most events are not pushes: only the lines which may hold commits are decoded
+                if not '"PushEvent"' in line and not '"sha"' in line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.decoder.JSONDecodeError:
+                    continue
+                if record.get('type') == 'PushEvent':
+                    repositoryName = ((record.get('repo') or {}).get('name') or '').lower()
+                    if not repositoryName in repositories:
+                        continue
+                    commits = pushCommits(record, apiUrl + "/repos/" + record['repo']['name'] + "/commits")
+                elif 'sha' in record and '/repos/' in record.get('url', ''):
+                    repositoryName = "/".join(record['url'].split('/repos/', 1)[1].split('/')[:2]).lower()
+                    if not repositoryName in repositories:
+                        continue
+                    commits = [record]
+                else:
+                    continue
+                repositoryNumber = repositories[repositoryName]
+                if not repositoryNumber in partFiles:
+                    os.makedirs(os.path.join(tmpDir, str(repositoryNumber)), exist_ok=True)
+                    partFiles[repositoryNumber] = open(os.path.join(tmpDir, str(repositoryNumber), str(archiveNumber) + ".jsonl"), 'w')
+                for commit in commits:
+                    partFiles[repositoryNumber].write(json.dumps(project(commit, schema)) + "\n")
+                    numberOfCommits += 1
+    finally:
+        for partFile in partFiles.values():
+            partFile.close()
+    return archiveFile, numberOfLines, numberOfCommits
+
+###################################################################################################################
+# FUNCTION importedCommits
+###################################################################################################################
+# yields the commits found for a repository, in the order of the archive files, without the commits
+# already saved for the project ('knownCommits')
+
+def importedCommits(repositoryNumber, knownCommits):
+    repositoryDir = os.path.join(tmpDir, str(repositoryNumber))
+    if not os.path.exists(repositoryDir):
+        return
+    for partFileName in sorted(os.listdir(repositoryDir), key=lambda name: int(name.split('.')[0])):
+        with open(os.path.join(repositoryDir, partFileName)) as partFile:
+            for line in partFile:
+                commit = json.loads(line)
+                if not commit['sha'] in knownCommits:
+                    knownCommits.add(commit['sha'])
+                    yield commit
+
+# sort key putting "2015-01-01-2.json.gz" before "2015-01-01-10.json.gz"
+def naturalKey(fileName):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', fileName)]
+
+###################################################################################################################
+# BODY
+###################################################################################################################
+
+if __name__ == '__main__':
+
+    # get command line arguments
+    try:
+        options, remainder = getopt(argv[1:], 'a:i:o:n:jzs:krh', ['archives=', 'input=', 'output=', 'processes=', 'jsonl',
+                                                                  'gzip', 'schema=', 'patches', 'rewrite', 'api=', 'help'])
+    except GetoptError as err:
+        print(str(err))
+        exit(2)
+
+    # initialise the parameters to be found in the arguments
+    archiveDir = ''
+    CSVFileReference = ''
+    outputDir = ''
+    processes = multiprocessing.cpu_count()
+    fileFormat = '.commits.json'
+    schemaFile = ''
+    keepPatches = False
+    rewrite = False
+    apiUrl = 'https://api.github.com'
+
+    # search the parameters in the arguments given to the script
+    for option, argument in options:
+        if option in ('-a','--archives'):
+            archiveDir = argument
+        elif option in ('-i','--input'):
+            CSVFileReference = argument
+        elif option in ('-o','--output'):
+            outputDir = argument
+        elif option in ('-n','--processes'):
+            processes = int(argument)
+        elif option in ('-j','--jsonl') and fileFormat == '.commits.json':
+            fileFormat = '.commits.jsonl'
+        elif option in ('-z','--gzip'):
+            fileFormat = '.commits.jsonl.gz'
+        elif option in ('-s','--schema'):
+            schemaFile = argument
+        elif option in ('-k','--patches'):
+            keepPatches = True
+        elif option in ('-r','--rewrite'):
+            rewrite = True
+        elif option == '--api':
+            apiUrl = argument.rstrip('/')
+        elif option in ('-h','--help'):
+            help()
+
+    # check whether all required parameters have been given as arguments and if not throw exception and abort
+    if archiveDir == '':
+        print("Argument required: archive directory. Type '-a <directory path>' in the command line")
+        exit(2)
+    if CSVFileReference == '':
+        print("Argument required: input CSV file. Type '-i <filepath>' in the command line")
+        exit(2)
+    if outputDir == '':
+        print("Argument required: output directory. Type '-o <directory path>' in the command line")
+        exit(2)
+    if not os.path.exists(outputDir):
+        os.makedirs(outputDir)
+
+    # read the projects, the projects already imported are ignored (except in rewrite mode)
+    projects = []
+    repositories = {}
+    with open(CSVFileReference, newline='') as csvInput:
+        for row in csv.reader(csvInput, delimiter=';'):
+            if len(row) == 0:
+                continue
+            if not rewrite and os.path.exists(os.path.join(outputDir, row[0] + ".aggregated" + fileFormat)):
+                print(row[0] + " already imported")
+                continue
+            projectRepositories = []
+            for cell in row[1:]:
+                if len(cell.split('/')) != 2:
+                    print("wrong cell format, should be 'username' '/' 'repository' - cell ignored: '" + cell + "'")
+                    continue
+                repositories.setdefault(cell.lower(), len(repositories))
+                projectRepositories.append(cell)
+            projects.append((row[0], projectRepositories))
+    print(str(len(projects)) + " projects and " + str(len(repositories)) + " repositories searched")
+
+    # list the archive files, in chronological order if they are named after their date
+    archiveFiles = sorted([f for f in os.listdir(archiveDir) if os.path.isfile(os.path.join(archiveDir, f))
+                           and f.endswith(archiveExtensions)], key=naturalKey)
+    print(str(len(archiveFiles)) + " archive files found")
+
+    schema = loadSchema(schemaFile, keepPatches)
+    tmpDir = tempfile.mkdtemp(prefix='goimport_', dir=outputDir)
+    try:
+        # parse the archive files in parallel
+        tasks = [(i, os.path.join(archiveDir, f)) for i, f in enumerate(archiveFiles)]
+        with multiprocessing.Pool(processes, initialiseScan, (repositories, schema, tmpDir, apiUrl)) as pool:
+            for i, (archiveFile, numberOfLines, numberOfCommits) in enumerate(pool.imap_unordered(scanArchive, tasks)):
+                # processbar
+                stdout.write('\r')
+                stdout.write("[%-30s] %d%%" % ('=' * int(i*30/len(tasks)+1),  i*100/len(tasks)+1))
+                stdout.flush()
+                print(" " + os.path.basename(archiveFile) + ": " + str(numberOfLines) + " lines, " + str(numberOfCommits) + " commits")
+
+        # write the commit files of each repository and the aggregated commit file of each project
+        for projectName, projectRepositories in projects:
+            knownCommits = set()
+            repoCommitFiles = []
+            for repository in projectRepositories:
+                repoOwner, repoName = repository.split('/')
+                commitFileName = os.path.join(outputDir, projectName+"-"+repoOwner+"-"+repoName+fileFormat)
+                with commitWriter(commitFileName) as writer:
+                    for commit in importedCommits(repositories[repository.lower()], knownCommits):
+                        writer.write(commit)
+                print(projectName + " - " + repository + ": " + str(writer.count) + " commits imported")
+                repoCommitFiles.append(commitFileName)
+            aggregatedCommitFileName = os.path.join(outputDir, projectName+".aggregated"+fileFormat)
+            with commitWriter(aggregatedCommitFileName) as writer:
+                for commit in commitChain([commitFile(fileName) for fileName in repoCommitFiles]):
+                    writer.write(commit)
+            print("created aggregated commit file " + aggregatedCommitFileName + " (" + str(writer.count) + " commits)")
+    finally:
+        shutil.rmtree(tmpDir)
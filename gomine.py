@@ -8,13 +8,21 @@ goMine.py
 extract commit data from a list of repositories and saves them in two JSON files
 - a json file containig the reference of all branches of all forks of the repository
 - a json file containing the references of all commits of the repository
+  (or, in store mode, a manifest listing the shas of these commits, the commits themselves being 
+  saved once in a content-addressed commit store, see commitStore.py)
+  commit files are written record by record, as a JSON list or in the JSON Lines format (see commitFile.py)
+  only the commit fields given in a schema are saved, patches are dropped by default (see commitSchema.py)
+at the end of the extraction, a summary of each project (CSV) and a report of the requests sent to the GitHub
+API (latency, bytes, status and remaining requests per endpoint, JSON, see apiMetrics.py) are written as well
 Authors: Kerstin Carola Schmidt, Jérémy Bonvoisin, Jonas Massmann
 Homepage: http://opensourcedesign.cc
 License: GPL v.3
 
 PREREQUISITES: 
 --------------
-- a file named ".token" and including a GitHub OAUTH Access Token
+- a file named ".token" and including one or several GitHub OAUTH Access Tokens, one per line,
+  formated either as <Token> (used with the username given in the arguments) or <UserName>:<Token>.
+  The requests are distributed over the tokens (see tokenPool.py)
 - a CSV file containing a list of repositories formated as follows
   . line separator: CR
   . column separator: ;
@@ -22,7 +30,7 @@ PREREQUISITES:
   . cell content: 
       . first cell of each row : project name
       . other cells: repository references <UserName>/<RepositoryName>
-- internet connection
+- internet connection (except if commits are mined from local clones, see the option --git)
 
 ARGUMENTS:
 ----------
@@ -45,11 +53,26 @@ import json
 import requests
 import datetime
 import getopt
+import hashlib
+import itertools
+import gzip
+import threading
+import multiprocessing
 from logging.handlers import RotatingFileHandler
 from datetime import date
+from urllib.parse import urlparse, parse_qs, quote
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 # own libraries
 from timeStop import timeStop
-from time import sleep
+from commitStore import commitStore
+from commitFile import commitFile, commitChain, commitWriter, commitFileExtensions
+from commitSchema import loadSchema, project, covers, merge
+from tokenPool import tokenPool, newBudget
+from apiMetrics import apiMetrics
+from requestControl import requestController, apiError
+from responseArchive import responseArchive
+import gitLog
+from time import sleep, monotonic, time
 
 #############################################################################################
 # FUNCTION help
@@ -62,7 +85,40 @@ def help():
     print('-o     --output   <path>     path of the directory where the JSON files should be stored')
     print('Optional Arguments:')
     print('-r     --rewrite             rewrite mode (rewrites already extracted GraphML files)')
+    print('-n     --concurrency <n>     number of commit requests kept in flight (default: 4)')
+    print('-p     --poolsize <n>        number of connections kept alive (default: concurrency)')
+    print('-c     --cache <path>        directory of the response cache used for conditional requests')
+    print('-t     --store <path>        directory of the commit store shared by all repositories and projects;')
+    print('                             commit files are then written as manifests listing commit shas')
+    print('-a     --incremental         incremental mode (updates existing commit files with the commits')
+    print('                             added since the last extraction)')
+    print('-f     --forkdepth <n>       maximum depth of forks crawled for branches (default: no limit)')
+    print('-j     --jsonl               write commit files in the JSON Lines format (one commit per line)')
+    print('-z     --gzip                write commit files in the JSON Lines format compressed with gzip')
+    print('-g     --git <path>          mine the commits from local bare clones stored in this directory as')
+    print('                             <path>/<owner>/<repo>.git instead of the GitHub API (no fork considered)')
+    print('       --cloneurl <url>      root URL from which missing clones are cloned (default: https://github.com)')
+    print('-l     --listing             discover the history with the paginated commit listing first,')
+    print('                             then only fetch the details of commits not extracted yet')
+    print('-s     --schema <path>       JSON file describing the commit fields to be kept (default: the fields')
+    print('                             used by goCreateGraphs.py, see commitSchema.py)')
+    print('-k     --patches             keep the diff of every file change (\'patch\') in the commits')
     print('-d     --debug               debug mode (generates more traces)')
+    print('       --since <date>        filtered extract: only commits made since the date (ISO 8601, e.g. 2019-01-31)')
+    print('       --until <date>        filtered extract: only commits made until the date')
+    print('       --path <path>         filtered extract: only commits changing files in the path (repeatable)')
+    print('       --extension <ext>     filtered extract: only commits changing files with the extension, e.g. .stl')
+    print('                             (repeatable). The filters are described in <project>.extract.json;')
+    print('                             files extracted without filters are only overwritten in rewrite mode')
+    print('-e     --estimate            dry run: estimates the requests, time and disk space needed by each project')
+    print('                             with a few requests per repository, and writes the plan without mining')
+    print('-w     --workers <n>         number of projects mined in parallel worker processes (default: 1)')
+    print('       --record <path>       record the responses of the API in an archive (SQLite file)')
+    print('       --replay <path>       replay the responses recorded in the archive, only the requests missing')
+    print('                             in the archive are sent (and recorded). No token file is needed')
+    print('       --retries <n>         number of retries of requests throttled or failed (default: 5)')
+    print('       --prometheus <path>   also write the metrics of the requests in the Prometheus text format')
+    print('       --api <url>           root URL of the GitHub API (default: https://api.github.com)')
     print('-h     --help                calls help function')
     exit()
 
@@ -74,7 +130,10 @@ def help():
 def pause(xRateLimit, xReset):
     if xRateLimit < 10:
         secondsToWait = int((datetime.datetime.fromtimestamp(xReset)-datetime.datetime.now()).total_seconds())
-        logger.info("Rate limit of allowed requests on GitHub nearly reached. Next allowance reset " + str(datetime.datetime.fromtimestamp(xReset).strftime('%Y-%m-%d %H:%M:%S')) + " "+ str(secondsToWait) + " seconds to be waited")
+        # another thread may already have waited for this reset
+        if secondsToWait < 0:
+            return
+        logger.info("Rate limit of allowed requests on GitHub nearly reached for all tokens. Next allowance reset " + str(datetime.datetime.fromtimestamp(xReset).strftime('%Y-%m-%d %H:%M:%S')) + " "+ str(secondsToWait) + " seconds to be waited")
         #go in sleep
         for i in range(secondsToWait+1,0,-1):
             sleep(1)
@@ -85,6 +144,173 @@ def pause(xRateLimit, xReset):
         logger.debug("continue process")
     
     
+###################################################################################################################
+# FUNCTION read_cache / write_cache
+###################################################################################################################
+# on-disk cache of API responses, used to send conditional requests (If-None-Match / If-Modified-Since).
+# GitHub answers a conditional request with a '304 Not Modified' when the resource did not change, and such 
+# answers are not counted against the rate limit. One JSON file per URL is stored in the cache directory.
+
+def cache_file(url):
+    return os.path.join(cacheDir, hashlib.md5(url.encode()).hexdigest() + ".json")
+
+def read_cache(url):
+    if cacheDir == '' or not os.path.exists(cache_file(url)):
+        return None
+    try:
+        with open(cache_file(url)) as json_file:
+            return json.load(json_file)
+    except json.decoder.JSONDecodeError as err:
+        logger.warning("unable to decode cached response for '" + url + "'. Error returned: " + str(err))
+        return None
+
+def write_cache(url, response):
+    if cacheDir == '' or response.status_code != 200:
+        return
+    if not 'ETag' in response.headers and not 'Last-Modified' in response.headers:
+        return
+    cached = {'url': url,
+              'etag': response.headers.get('ETag'),
+              'last_modified': response.headers.get('Last-Modified'),
+              'headers': {key: value for key, value in response.headers.items() 
+                          if not key.lower() in ('content-encoding', 'content-length', 'transfer-encoding')},
+              'body': response.text}
+    # write in a temporary file first so that a crash never leaves a truncated cache entry (the name of the
+    # temporary file is unique per process and thread, worker processes may share the cache directory)
+    tmpFileName = cache_file(url) + "." + str(os.getpid()) + "." + str(threading.get_ident()) + ".tmp"
+    with open(tmpFileName, 'w') as json_file:
+        json.dump(cached, json_file)
+    os.replace(tmpFileName, cache_file(url))
+
+###################################################################################################################
+# FUNCTION api_request
+###################################################################################################################
+# sends a single GET request to the GitHub API with the token of the pool 'logins' having the most
+# remaining requests, and waits if the rate limits of all tokens are nearly reached.
+# All requests share one session, so that connections are kept alive and reused (see 'poolSize').
+# Can be called from several threads: while one thread waits for the rate limit reset, the
+# other threads do not send new requests. Every request and every pause is recorded in 'metrics'.
+# The number of requests in flight is adapted by 'controller' (see requestControl.py): requests 
+# throttled by the secondary rate limits of GitHub, answered with a server error or without answer
+# are retried after a backoff delay. Requests answered with the primary rate limit of their token are sent
+# again once a token has requests left, at most 'retries' times. An apiError is raised when all retries failed.
+# Responses are written in the response archive, if any. In replay mode, archived responses are served 
+# without sending any request, only the URLs missing in the archive are requested (if a token is given).
+
+def api_request(url, logins):
+    
+    if archive is not None and replayMode:
+        archived = archive.get(url)
+        if archived is not None:
+            logger.debug("archived response used for " + url)
+            response = requests.Response()
+            response.url = url
+            response.status_code, headers, response._content = archived
+            response.headers = requests.structures.CaseInsensitiveDict(headers)
+            response.encoding = 'utf-8'
+            return response
+        if len(logins.logins) == 0:
+            raise apiError(url, 0, "missing in the response archive, no token to request it")
+    
+    attempt = 0
+    rateLimited = 0
+    while True:
+        # wait here as long as another thread is sleeping in pause()
+        with rateLimitLock:
+            pass
+        login = logins.acquire()
+        while login is None:
+            with rateLimitLock:
+                startPause = monotonic()
+                pause(0, logins.nextReset())
+                metrics.recordPause(monotonic() - startPause)
+            login = logins.acquire()
+        
+        # make the request conditional if the response is already cached
+        headers = {}
+        cached = read_cache(url)
+        if cached is not None:
+            if cached['etag'] is not None:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified'] is not None:
+                headers['If-Modified-Since'] = cached['last_modified']
+        
+        controller.acquire()
+        startRequest = monotonic()
+        try:
+            response = session.get(url, auth=(login[0],login[1]), headers=headers, timeout=requestTimeout)
+        except requests.exceptions.RequestException as e:
+            response = None
+            reason = str(e)
+        finally:
+            controller.release()
+        seconds = monotonic() - startRequest
+        
+        retryAfter = None
+        if response is None:
+            status = 'error'
+            metrics.record(url, seconds, 0, status)
+        else:
+            status = response.status_code
+            logger.debug("request URL: " + url)
+            logger.debug("response header: " + str(response.headers))
+            #get remaining allowed requests
+            logins.update(login, response.headers)
+            metrics.record(url, seconds, len(response.content), status, status == 304 and cached is not None,
+                           int(response.headers['X-RateLimit-Remaining']) if 'X-RateLimit-Remaining' in response.headers else None)
+            
+            if status in (403, 429) and response.headers.get('X-RateLimit-Remaining') == '0':
+                # rate limit of the token reached: the request is sent again once a token has requests left
+                rateLimited += 1
+                if rateLimited > controller.retries:
+                    raise apiError(url, status, "rate limit reached " + str(rateLimited) + " times")
+                reset = int(response.headers['X-RateLimit-Reset']) if response.headers.get('X-RateLimit-Reset', '').isdigit() else 0
+                # if the reset is already past on the local clock (clock skew, or the server resets late), the token
+                # looks refreshed to the pool: wait at least until one second after the reset before sending again
+                delay = 0
+                if reset <= time():
+                    delay = max(1.0, controller.delay(rateLimited))
+                logger.warning("rate limit of the token of '" + login[0] + "' reached, request " + url + " postponed"
+                               + (" by " + str(round(delay, 1)) + " seconds" if delay > 0 else ""))
+                if delay > 0:
+                    sleep(delay)
+                    metrics.recordPause(delay)
+                continue
+            if status in (403, 429) and ('Retry-After' in response.headers or 'secondary rate limit' in response.text.lower()):
+                reason = "secondary rate limit"
+                # without indication, GitHub recommends to wait at least one minute
+                retryAfter = int(response.headers['Retry-After']) if response.headers.get('Retry-After', '').isdigit() else 60
+            elif status >= 500:
+                reason = "server error"
+            else:
+                controller.success()
+                break
+        
+        controller.failure()
+        if attempt >= controller.retries:
+            raise apiError(url, status, reason)
+        delay = controller.delay(attempt, retryAfter)
+        logger.warning("request " + url + " failed (" + str(status) + ", " + reason + "), retry " + str(attempt + 1) + " in " 
+                       + str(round(delay, 1)) + " seconds. Requests in flight limited to " + str(controller.inFlightLimit()))
+        sleep(delay)
+        metrics.recordPause(delay)
+        attempt += 1
+    
+    if response.status_code == 304 and cached is not None:
+        # not modified: serve the cached body, keep the current rate limit headers
+        logger.debug("not modified, cached response used")
+        cachedHeaders = requests.structures.CaseInsensitiveDict(cached['headers'])
+        cachedHeaders.update(response.headers)
+        response.headers = cachedHeaders
+        response.status_code = 200
+        response.encoding = 'utf-8'
+        response._content = cached['body'].encode('utf-8')
+    else:
+        write_cache(url, response)
+    if archive is not None:
+        archive.put(url, response.status_code, response.headers, response.content)
+    return response
+
 ###################################################################################################################
 # FUNCTION req
 ###################################################################################################################
@@ -96,318 +322,1111 @@ def req(url, author):
     data_set = []
     status_codes = []
     
-    response = requests.get(url, auth=(author[0],author[1]))
-    logger.debug("request URL: " + url)
-    logger.debug("response header: " + str(response.headers))
+    response = api_request(url, author)
     #save status code
     status_codes.append(response.status_code)
+    # any other status than 200 comes with an error message instead of a list of items: stop there
+    if response.status_code != 200:
+        return data_set, status_codes
     raw = response.json()
-    
-    #get remaining allowed requests
-    try:
-        pause(int(response.headers['X-RateLimit-Remaining']), int(response.headers['X-RateLimit-Reset']))
-    except Exception as e: 
-        print ("error at line 110")
-        logger.error("Error occured: " + str(e))
-        logger.error("request URL: " + url)
-        logger.error("response header: " + str(response.headers))
-        raise Exception('blah!')
     for line in raw:
         data_set.append(line)
         
-    if len(data_set) != 0 and 'next' in response.links:
+    # follow the 'next' links until the last page has been loaded
+    while len(data_set) != 0 and 'next' in response.links:
+        response = api_request(response.links['next']['url'], author)
+        status_codes.append(response.status_code)
+        if response.status_code != 200:
+            break
+        raw = response.json()  
+        for line in raw:
+            data_set.append(line) 
             
-        while response.links['next']['url'] != response.links['last']['url']:  
-            response = requests.get(response.links['next']['url'], auth=(author[0],author[1]))
-            logger.debug("request URL: " + url)
-            logger.debug("response header: " + str(response.headers))
-            status_codes.append(response.status_code)
-            raw = response.json()  
-            
-            #get remaining allowed requests
-            try:
-                pause(int(response.headers['X-RateLimit-Remaining']), int(response.headers['X-RateLimit-Reset']))
-            except Exception as e: 
-                print ("error at line 131")
-                logger.error("Error occured: " + str(e))
-                logger.error("request URL: " + url)
-                logger.error("response header: " + str(response.headers))
-                raise Exception('blah!')
-            for line in raw:
-                data_set.append(line) 
-            
-            """
-            r = requests.get(r.links['next']['url'], auth=(author[0],author[1]))
-            status_codes.append(r.status_code)
-            raw = r.json()
-        
-        
-            get remaining allowed requests
-            try:
-                pause(int(r.headers['X-RateLimit-Remaining']), int(r.headers['X-RateLimit-Reset']))
-            except Exception as e: 
-                print ("Error occured: " + str(e))
-                print ("response header: " + r.headers)
-                sys.exit(2)
-                for line in raw: 
-                    data_set.append(line)
-            """
     return data_set, status_codes
     
+###################################################################################################################
+# FUNCTION get_repo_branches
+###################################################################################################################
+# Returns the branches and the forks of a single repository in json format as delivered by GitHub
+# The forks are only requested if the repository is known to have some ('forksCount').
+
+def get_repo_branches(owner, repo, forksCount, logins):
+    
+    # if we get an error (e.g. 404, or 451 for a repository blocked for legal reasons, or the failure of all
+    # retries), there is no point of going further. raise warning and skip the repository, the rest of the
+    # network is still crawled
+    try:
+        branches, status_codes = req(apiUrl + "/repos/{}/{}/branches?per_page=100".format(owner,repo), logins)
+    except apiError as e:
+        logger.error("API request for the branches of repository "+owner+"/"+repo+" failed: "+str(e))
+        return [], []
+    if status_codes[-1] != 200:
+        logger.error("API request for the branches of repository "+owner+"/"+repo+" raised a "+str(status_codes[-1])+" error")
+        return [], []
+    
+    forks = []
+    if forksCount != 0:
+        try:
+            forks, status_codes = req(apiUrl + "/repos/{}/{}/forks?per_page=100".format(owner,repo), logins)
+        except apiError as e:
+            logger.error("API request for the forks of repository "+owner+"/"+repo+" failed: "+str(e))
+            return [], []
+        
+        # if we get an error, there is no point of going further. raise warning and exit
+        if status_codes[-1] != 200:
+            logger.error("API request for the forks of repository "+owner+"/"+repo+" raised a "+str(status_codes[-1])+" error")
+            return [], []
+    
+    return branches, forks
+
 ###################################################################################################################
 # FUNCTION get_all_branches
 ###################################################################################################################
 # Returns all branches of all forks of a repository in json format as delivered by GitHub
+# The fork network is crawled breadth first, one level of forks after the other (the repository itself 
+# being level 0), up to the level 'forkDepth' (no limit if negative). The repositories of a level are 
+# requested concurrently. Branches pointing to a commit already pointed to by another branch are ignored.
+
 def get_all_branches(owner, repo, logins):
     
-    requestUrl = "https://api.github.com/repos/{}/{}/branches?per_page=100".format(owner,repo)
-    response = requests.get(requestUrl,auth=(logins[0],logins[1]))
-    logger.debug("request URL: " + requestUrl)
-    logger.debug("response header: " + str(response.headers))
-
-    #get remaining allowed requests
-    try:
-        pause(int(response.headers['X-RateLimit-Remaining']), int(response.headers['X-RateLimit-Reset']))
-    except Exception as e: 
-        print ("error at line 171")
-        logger.error("Error occured: " + str(e))
-        logger.error("request URL: " + requestUrl)
-        logger.error("response header: " + str(response.headers))
-        raise Exception('blah!')
-    
-    # if we get a 404, there is no point of going further. raise warning and exit
-    if response.status_code == 404:
-        logger.error("API request for repository "+owner+"/"+repo+" raised a 404 error")
-        return []
-
-    # if the response is not a 404, then we can go on and decode branches and forks
-    branches = json.loads(response.text)
-    
-    if len(branches) == 100:
-        logger.error("More than 100 branches -> second page needs to be loaded -> change of algorithm neccessary")
-
-    forks, status_codes = req("https://api.github.com/repos/{}/{}/forks?per_page=100".format(owner,repo),
-                logins)
-    
-    # if we get a 404, there is no point of going further. raise warning and exit
-    if 404 in status_codes:
-        logger.error("API request for repository "+owner+"/"+repo+" raised a 404 error")
-        return []
-    
-    # parse all forks of the current repo
-    for fork in forks:
-        logger.info("    . in " + fork['owner']['login'] + "'s fork")
-        branchesToAdd =    get_all_branches(fork['owner']['login'],fork['name'], logins)
-        for itema in branchesToAdd:
-            duplicate = False
-            for itemb in branches:
-                if itema['commit']['sha']==itemb['commit']['sha']:
-                    duplicate = True
-                    break
-            if not duplicate:
-                branches.append(itema)
+    branches = []
+    knownHeads = set()
+    knownRepos = set()
+    # repositories of the current level: (owner, name, number of forks or None if unknown)
+    level = [(owner, repo, None)]
+    depth = 0
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while level and (forkDepth < 0 or depth <= forkDepth):
+            knownRepos.update((item[0], item[1]) for item in level)
+            nextLevel = []
+            newBranches = 0
+            results = executor.map(lambda item: get_repo_branches(item[0], item[1], item[2], logins), level)
+            for item, (repoBranches, forks) in zip(level, results):
+                if depth != 0:
+                    logger.info("    . in " + item[0] + "'s fork")
+                for branch in repoBranches:
+                    if not branch['commit']['sha'] in knownHeads:
+                        knownHeads.add(branch['commit']['sha'])
+                        branches.append(branch)
+                        newBranches += 1
+                # do not request forks beyond the maximum depth
+                if forkDepth < 0 or depth < forkDepth:
+                    for fork in forks:
+                        if not (fork['owner']['login'], fork['name']) in knownRepos:
+                            nextLevel.append((fork['owner']['login'], fork['name'], fork.get('forks_count')))
+            logger.info("    level " + str(depth) + ": " + str(len(level)) + " repositories, " + str(newBranches) + " new branches, " + str(len(nextLevel)) + " forks")
+            level = nextLevel
+            depth += 1
 
     return branches  
 
 ###################################################################################################################
-# FUNCTION get_predecessors
+# FUNCTION estimate_repository
+###################################################################################################################
+# Estimates the cost of the extraction of a repository with a few requests (dry run):
+# - the repository information gives the number of forks of the fork network ('network_count')
+# - the commit listing with one commit per page gives the number of commits of the default branch
+#   as the number of its last page (see the 'last' link)
+# - the head commit gives the size of a commit once reduced to the schema
+# The commits of the other branches and the commits added by forks are not counted, nor is the
+# extension filter of a filtered extract.
+# Returns the estimation as a dict, or None if the repository cannot be found.
+
+def estimate_repository(owner, repo, logins, existingCommitFileName):
+    
+    startTime = monotonic()
+    response = api_request(apiUrl + "/repos/{}/{}".format(owner,repo), logins)
+    if response.status_code != 200:
+        logger.error("API request for repository "+owner+"/"+repo+" raised a " + str(response.status_code) + " error")
+        return None
+    repoData = response.json()
+    forks = repoData.get('network_count', repoData.get('forks_count', 0)) if forkDepth != 0 else 0
+    
+    # number of commits of the default branch (passing the filters of a filtered extract, one listing per path)
+    commits = 0
+    listedCommits = []
+    for query in filter_queries():
+        listUrl = apiUrl + "/repos/{}/{}/commits?per_page=1".format(owner,repo) + query
+        if 'default_branch' in repoData:
+            listUrl += "&sha=" + repoData['default_branch']
+        response = api_request(listUrl, logins)
+        if response.status_code == 200 and len(response.json()) != 0:
+            listedCommits = response.json()
+        if 'last' in response.links:
+            commits += int(parse_qs(urlparse(response.links['last']['url']).query)['page'][0])
+        elif response.status_code == 200:
+            commits += len(response.json())
+    
+    # size of a commit in the commit file
+    commitBytes = 0
+    if len(listedCommits) != 0:
+        response = api_request(listedCommits[0]['url'], logins)
+        if response.status_code == 200:
+            commitData = json.dumps(project(response.json(), schema)).encode('utf-8')
+            commitBytes = len(gzip.compress(commitData)) if fileFormat.endswith('.gz') else len(commitData)
+    
+    # commits already extracted are not requested again, except in rewrite mode
+    existingCommits = 0
+    if existingCommitFileName is not None and not rewriteMode:
+        existingCommits = sum(1 for commit in load_commits(existingCommitFileName))
+    commitRequests = 0 if existingCommits != 0 and not incrementalMode else max(commits - existingCommits, 0)
+    if (listingMode and not incrementalMode) or extract_filter() is not None:
+        commitRequests += (commits + 99) // 100
+    # branches of every repository of the fork network, forks listed 100 per page
+    branchRequests = 0 if existingCommits != 0 and not incrementalMode else 1 + forks + (forks + 99) // 100
+    
+    return {'repository': owner + "/" + repo,
+            'forks': forks,
+            'commits': commits,
+            'requests': branchRequests + commitRequests,
+            'bytes': commitRequests * commitBytes if store is None else commitRequests * (commitBytes + 43),
+            'seconds': monotonic() - startTime}
+
+###################################################################################################################
+# FUNCTION estimate_project
 ###################################################################################################################
-# Returns the list of all predecessors of a given commit in the Json format provided by GitHub
+# Estimates the cost of the extraction of the repositories of a project, given as a row of the input CSV file
+# (see estimate_repository). The size of the aggregated commit file is included in the disk footprint.
 
-def get_predecessors(commitUrl, logins):
+def estimate_project(row):
+    projectName = row[0]
+    estimate = {'project': projectName, 'repositories': 0, 'forks': 0, 'commits': 0, 'requests': 0, 'bytes': 0,
+                'latency': 0.0, 'metadata_requests': 0}
+    metrics.setScope(projectName, '')
+    for cell in row[1:]:
+        repoRefs = cell.split('/')
+        if len(repoRefs) != 2:
+            logger.error("wrong cell format, should be 'username' '/' 'repository' - line ignored: '"+ str(cell) +"'")
+            continue
+        requestsBefore = metrics.requests()
+        existingCommitFileName = find_commit_file(os.path.join(outputDir,projectName+"-"+repoRefs[0]+"-"+repoRefs[1]))
+        repositoryEstimate = estimate_repository(repoRefs[0], repoRefs[1], auth, existingCommitFileName)
+        estimate['metadata_requests'] += metrics.requests() - requestsBefore
+        if repositoryEstimate is None:
+            continue
+        logger.info("    " + repositoryEstimate['repository'] + ": " + str(repositoryEstimate['commits']) + " commits, " 
+                    + str(repositoryEstimate['forks']) + " forks, " + str(repositoryEstimate['requests']) + " requests")
+        estimate['repositories'] += 1
+        for field in ('forks', 'commits', 'requests', 'bytes'):
+            estimate[field] += repositoryEstimate[field]
+        estimate['latency'] += repositoryEstimate['seconds']
+    # the aggregated commit file holds the commits of all repositories again
+    estimate['bytes'] *= 2
+    estimate['latency'] = estimate['latency'] / max(estimate['metadata_requests'], 1)
+    return estimate
+
+###################################################################################################################
+# FUNCTION print_plan
+###################################################################################################################
+# prints the estimated cost of the extraction of each project and of the whole input file, and writes it 
+# in a CSV file. The wall time is estimated from the latency of the requests sent for the estimation, the 
+# number of requests in flight ('concurrency') and the rate limits of the tokens: requests exceeding the 
+# remaining requests of the tokens have to wait for the next rate limit windows (one hour each).
+
+def print_plan(estimates, planFileName):
+    available = sum(status[1] for status in auth.status())
+    perWindow = sum(auth.limit)
+    latency = sum(estimate['latency'] * estimate['metadata_requests'] for estimate in estimates) / max(sum(estimate['metadata_requests'] for estimate in estimates), 1)
     
-    response = requests.get(commitUrl,auth=(logins[0],logins[1]))
-    logger.debug("request URL: " + commitUrl)
-    logger.debug("response header: " + str(response.headers))
+    with open(planFileName, 'w', newline='') as csvOutput:
+        CSVWriter = csv.writer(csvOutput, delimiter=';')
+        CSVWriter.writerow(['project', 'repositories', 'forks', 'commits', 'requests', 'hours', 'megabytes'])
+        logger.info("{:<30} {:>6} {:>8} {:>10} {:>10} {:>8} {:>10}".format('project', 'repos', 'forks', 'commits', 'requests', 'hours', 'MB'))
+        cumulatedRequests = 0
+        for estimate in estimates + [None]:
+            if estimate is None:
+                # totals
+                estimate = {'project': 'TOTAL'}
+                for field in ('repositories', 'forks', 'commits', 'requests', 'bytes'):
+                    estimate[field] = sum(other[field] for other in estimates)
+                hours = hours_needed(estimate['requests'], latency, available, perWindow)
+            else:
+                # the projects are extracted one after the other
+                hours = hours_needed(cumulatedRequests + estimate['requests'], latency, available, perWindow) - hours_needed(cumulatedRequests, latency, available, perWindow)
+                cumulatedRequests += estimate['requests']
+            megabytes = round(estimate['bytes'] / 1000000, 1)
+            CSVWriter.writerow([estimate['project'], estimate['repositories'], estimate['forks'], estimate['commits'],
+                                estimate['requests'], round(hours, 2), megabytes])
+            logger.info("{:<30} {:>6} {:>8} {:>10} {:>10} {:>8} {:>10}".format(estimate['project'][:30], estimate['repositories'], estimate['forks'],
+                        estimate['commits'], estimate['requests'], round(hours, 2), megabytes))
+    logger.info(str(len(auth.logins)) + " tokens, " + str(available) + " requests available now, " + str(perWindow) + " per hour. Plan written in " + planFileName)
+
+# hours needed to send the given number of requests from now on
+def hours_needed(numberOfRequests, latency, available, perWindow):
+    seconds = numberOfRequests * latency / concurrency
+    if numberOfRequests > available:
+        # the requests exceeding the available ones wait for the next windows
+        seconds = max(seconds, -(-(numberOfRequests - available) // max(perWindow, 1)) * 3600)
+    return seconds / 3600
+
+###################################################################################################################
+# FUNCTION fetch_commit
+###################################################################################################################
+# Returns the details of a single commit in the Json format provided by GitHub
+# The commit is given as reference {'sha': ..., 'url': ...}. In store mode, the commit store is 
+# consulted before any request is sent, and fetched commits are added to the store. A stored commit
+# lacking fields of the schema (e.g. stored without the patches) is fetched again.
+
+def fetch_commit(commitRef, logins):
+    
+    if store is not None and commitRef['sha'] in store:
+        storedCommit, storedSchema = store.load(commitRef['sha'])
+        if covers(storedSchema, schema):
+            logger.info("     - "+commitRef['sha']+" (store)")
+            return project(storedCommit, schema)
+        # the stored commit lacks fields of the schema (e.g. the patches), it is fetched again
+        schemaToStore = merge(storedSchema, schema)
+    else:
+        schemaToStore = schema
+    
+    commitUrl = commitRef['url']
+    response = api_request(commitUrl, logins)
     try:
         if len(response.json()['files']) == 0:
             logger.error('filechanges could not be downloaded for CommitUrl (stats are zero): '+ commitUrl)
     except KeyError as err: #err never used??
         logger.error('filechanges could not be downloaded for CommitUrl (stats are not available): '+ commitUrl)
-    commitData = [json.loads(response.text)]
-    
-    #get remaining allowed requests
-    try: 
-        pause(int(response.headers['X-RateLimit-Remaining']), int(response.headers['X-RateLimit-Reset']))
-    except Exception as e: 
-        print ("error at line 232")
-        logger.error("Error occured: " + str(e))
-        logger.error("request URL: " + commitUrl)
-        logger.error("response header: " + str(response.headers))
-        raise Exception('blah!')
+    # only the fields of the schema are kept
+    fullCommitData = json.loads(response.text)
+    commitData = project(fullCommitData, schema)
+    
+    if not isinstance(commitData, dict) or not 'sha' in commitData:
+        raise apiError(commitUrl, response.status_code, "no commit delivered")
+    logger.info("     - "+commitData['sha'])
+    if store is not None:
+        store.put(project(fullCommitData, schemaToStore), schemaToStore)
+    return commitData
+
+# same as fetch_commit, but returns None if the commit could not be fetched. The error is logged and
+# the crawl goes on, the commit is fetched again when the history is repaired (see repair_history)
+def try_fetch_commit(commitRef, logins):
     try:
-        sha = commitData[0]['sha']
-    except Exception as e:
-        print ("error at line 238")
-        logger.error(commitData)
-        logger.error(e)
-        raise Exception('blah!')
-        
-    knownCommits.append(sha)
-    logger.info("     - "+sha)
+        return fetch_commit(commitRef, logins)
+    except apiError as e:
+        logger.error("commit " + commitRef['sha'] + " could not be extracted: " + str(e))
+        return None
 
-    # Gets the list of predecessors
-    for predecessor in commitData[0]['parents']:
-        if not predecessor['sha'] in knownCommits:
-            commitsToAdd = get_predecessors(predecessor['url'], logins)
-            knownCommits.append(predecessor['sha'])
-            for commit in commitsToAdd:
-                commitData.append(commit)
+###################################################################################################################
+# FUNCTION fetch_commits
+###################################################################################################################
+# Fetches the details of the given commits in the Json format provided by GitHub, without following 
+# their parents. The commits are given as references {'sha': ..., 'url': ...}.
+# Fetched commits are written in the journal as they arrive. Returns the number of fetched commits.
+
+def fetch_commits(commitRefs, logins, journal):
     
-    return commitData
+    numberOfCommits = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for commit in executor.map(lambda commitRef: try_fetch_commit(commitRef, logins), commitRefs):
+            if commit is None:
+                continue
+            knownCommits.add(commit['sha'])
+            write_journal(journal, commit)
+            numberOfCommits += 1
+    return numberOfCommits
+
+###################################################################################################################
+# FUNCTION list_history
+###################################################################################################################
+# Returns the skeleton of the history of the given commits as delivered by the paginated commit listing
+# of GitHub (100 commits per request). Listed commits carry their sha, url and parents but no file changes.
+# The commits are given as references {'sha': ..., 'url': ...}. The parameters given in 'query' (e.g. 
+# "&since=...") are added to the listing requests. With 'stopAtKnown', the listing of a head stops at the
+# first page holding only commits already listed or extracted.
+
+def list_history(commitRefs, logins, query='', stopAtKnown=True):
+    
+    skeleton = {}
+    for commitRef in commitRefs:
+        if commitRef['sha'] in skeleton:
+            continue
+        # <apiUrl>/repos/<owner>/<repo>/commits/<sha> -> .../commits?sha=<sha>
+        listUrl = commitRef['url'].rsplit('/',1)[0] + "?sha=" + commitRef['sha'] + "&per_page=100" + query
+        while listUrl is not None:
+            response = api_request(listUrl, logins)
+            if response.status_code != 200:
+                logger.error("API request for commit list "+listUrl+" raised a "+str(response.status_code)+" error")
+                break
+            listedCommits = response.json()
+            known = all(commit['sha'] in skeleton or commit['sha'] in knownCommits for commit in listedCommits)
+            for commit in listedCommits:
+                skeleton[commit['sha']] = commit
+            # a page holding only known commits has reached the history shared with another head (or extracted
+            # before): the rest of the history is not listed again. Parents of side branches missed this way
+            # are fetched by repair_history()
+            if known and stopAtKnown:
+                break
+            listUrl = response.links['next']['url'] if len(listedCommits) != 0 and 'next' in response.links else None
+    return list(skeleton.values())
+
+###################################################################################################################
+# FUNCTION extract_filter / list_filtered / filter_commits
+###################################################################################################################
+# In a filtered extract, only the commits of a time window ('since', 'until') changing files in the given
+# paths ('paths') or with the given extensions ('extensions') are extracted. The dates and paths are
+# handed over to the commit listing of GitHub, so that only the details of the listed commits are fetched;
+# a commit is listed if it changes a file in one of the paths. GitHub cannot filter by extension: the
+# commits are filtered once their details are fetched (in git mode, extensions are handed over to git 
+# when no path is given). All filters are applied again to the commits before they are saved, so that
+# commits resumed from the journal of another extraction are filtered too. The parents of the extracted
+# commits are not followed.
+
+# returns the description of the filters, or None if the full history is extracted
+def extract_filter():
+    if since == '' and until == '' and len(paths) == 0 and len(extensions) == 0:
+        return None
+    return {'filtered': True, 'since': since, 'until': until, 'paths': paths, 'extensions': extensions}
+
+# returns the parameters of the commit listing for each path (one listing per path)
+def filter_queries():
+    query = ''
+    if since != '':
+        query += "&since=" + quote(since)
+    if until != '':
+        query += "&until=" + quote(until)
+    if len(paths) == 0:
+        return [query]
+    return [query + "&path=" + quote(path) for path in paths]
+
+def list_filtered(commitRefs, logins):
+    skeleton = {}
+    for query in filter_queries():
+        # filtered extracts are not repaired, the listing of every head is complete
+        for commit in list_history(commitRefs, logins, query, False):
+            skeleton[commit['sha']] = commit
+    return list(skeleton.values())
+
+# returns the date given in ISO 8601 (dates without time zone are taken as UTC)
+def parse_date(value):
+    parsedDate = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsedDate.tzinfo is None:
+        parsedDate = parsedDate.replace(tzinfo=datetime.timezone.utc)
+    return parsedDate
+
+# returns True if the file is in one of the paths (a path being a file or a directory)
+def in_paths(fileName):
+    return any(fileName == path.strip('/') or fileName.startswith(path.strip('/') + '/') for path in paths)
+
+# yields the commits committed in the time window, changing a file in one of the paths and a file with one
+# of the extensions
+def filter_commits(commits):
+    sinceDate = parse_date(since) if since != '' else None
+    untilDate = parse_date(until) if until != '' else None
+    for commit in commits:
+        if sinceDate is not None or untilDate is not None:
+            commitDate = parse_date(commit['commit']['committer']['date'])
+            if (sinceDate is not None and commitDate < sinceDate) or (untilDate is not None and commitDate > untilDate):
+                continue
+        if len(paths) != 0 and not any(in_paths(file['filename']) for file in commit.get('files', [])):
+            continue
+        if len(extensions) == 0 or any(file['filename'].lower().endswith(tuple(extensions)) for file in commit.get('files', [])):
+            yield commit
+
+###################################################################################################################
+# FUNCTION get_predecessors
+###################################################################################################################
+# Fetches all predecessors of the given commits in the Json format provided by GitHub
+# The commits are given as references {'sha': ..., 'url': ...} as found in branches and parents.
+# The history is crawled from the given heads towards the root commits with an explicit work queue
+# (no recursion, so the length of the history is not bounded by the stack). Every fetched commit puts 
+# its unknown parents on the frontier, so that up to 'concurrency' commit requests are in flight.
+# The sha of every fetched commit is added to the set 'knownCommits' (the visited set), so that
+# it can be reused for checking the integrity of the extracted history.
+# Fetched commits are written in the journal as they arrive. Returns the number of fetched commits.
+
+def get_predecessors(commitRefs, logins, journal):
+    
+    numberOfCommits = 0
+    pending = {}
+    # shas of the commits already put on the frontier
+    scheduled = set()
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for commitRef in commitRefs:
+            if not commitRef['sha'] in scheduled:
+                scheduled.add(commitRef['sha'])
+                pending[executor.submit(try_fetch_commit, commitRef, logins)] = commitRef['sha']
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                commit = future.result()
+                if commit is None:
+                    continue
+                knownCommits.add(commit['sha'])
+                write_journal(journal, commit)
+                numberOfCommits += 1
+                
+                # Puts the unknown predecessors on the frontier
+                for predecessor in commit['parents']:
+                    if not predecessor['sha'] in knownCommits and not predecessor['sha'] in scheduled:
+                        scheduled.add(predecessor['sha'])
+                        pending[executor.submit(try_fetch_commit, predecessor, logins)] = predecessor['sha']
+    
+    return numberOfCommits
+
+###################################################################################################################
+# FUNCTION get_local_clone
+###################################################################################################################
+# Returns the path of the local bare clone of a repository in the directory 'gitDir'. If the repository
+# has not been cloned yet, it is cloned from '<cloneUrl>/<owner>/<repo>'.
+
+def get_local_clone(owner, repo):
+    clonePath = os.path.join(gitDir, owner, repo + ".git")
+    if not os.path.exists(clonePath):
+        logger.info(" - cloning " + cloneUrl + "/" + owner + "/" + repo)
+        gitLog.cloneRepository(cloneUrl + "/" + owner + "/" + repo, clonePath)
+    return clonePath
+
+###################################################################################################################
+# FUNCTION get_local_branches
+###################################################################################################################
+# Returns all branches of a local clone in json format as delivered by GitHub (forks are not considered)
+
+def get_local_branches(owner, repo):
+    return gitLog.listBranches(get_local_clone(owner, repo), apiUrl + "/repos/{}/{}/commits".format(owner,repo))
+
+###################################################################################################################
+# FUNCTION get_local_commits
+###################################################################################################################
+# Extracts all predecessors of the given commits from a local clone in the Json format provided by GitHub 
+# (see gitLog.py). The commits are given as references {'sha': ..., 'url': ...}. Commits already extracted
+# are ignored, the others are written in the journal. Returns the number of extracted commits.
+# The filters of a filtered extract are handed over to git (see extract_filter).
+
+def get_local_commits(owner, repo, commitRefs, journal):
+    numberOfCommits = 0
+    commitUrlRoot = apiUrl + "/repos/{}/{}/commits".format(owner,repo)
+    revisions = list(set(commitRef['sha'] for commitRef in commitRefs))
+    options = []
+    if since != '':
+        options.append("--since=" + since)
+    if until != '':
+        options.append("--until=" + until)
+    pathspecs = paths if len(paths) != 0 else [':(icase)*' + extension for extension in extensions]
+    for commit in gitLog.logCommits(get_local_clone(owner, repo), commitUrlRoot, revisions, options, pathspecs):
+        if not commit['sha'] in knownCommits:
+            knownCommits.add(commit['sha'])
+            write_journal(journal, project(commit, schema))
+            numberOfCommits += 1
+    return numberOfCommits
+
+###################################################################################################################
+# FUNCTION resume_journal / write_journal
+###################################################################################################################
+# The journal of a repository keeps the commits extracted so far, one JSON line per commit, flushed as 
+# soon as the commit has been fetched. If the extraction is interrupted, the journal is read again at 
+# the next start: the journaled commits are not fetched again and the crawl frontier is rebuilt from 
+# their parents which have not been extracted yet. Once the extraction is over, the journal is streamed 
+# into the commit file and deleted. Journaled commits which are already known (e.g. saved in the commit
+# file by a run interrupted before the journal was deleted) are dropped, so that they are not saved twice.
+
+def resume_journal(journalFileName):
+    numberOfCommits = 0
+    parents = []
+    # copy the valid lines, so that a line truncated by the interruption is dropped
+    with open(journalFileName) as journal, open(journalFileName + ".tmp", 'w') as validJournal:
+        for line in journal:
+            try:
+                commit = json.loads(line)
+            except json.decoder.JSONDecodeError:
+                logger.warning("truncated line ignored in journal '" + journalFileName + "'")
+                continue
+            if commit['sha'] in knownCommits:
+                continue
+            validJournal.write(json.dumps(commit) + "\n")
+            knownCommits.add(commit['sha'])
+            parents.extend(commit['parents'])
+            numberOfCommits += 1
+    os.replace(journalFileName + ".tmp", journalFileName)
+    frontier = [parent for parent in parents if not parent['sha'] in knownCommits]
+    return numberOfCommits, frontier
+
+def write_journal(journal, commit):
+    journal.write(json.dumps(commit) + "\n")
+    journal.flush()
+
+###################################################################################################################
+# FUNCTION find_commit_file / load_commits / save_commits
+###################################################################################################################
+# reads and writes commit files record by record (see commitFile.py). In store mode, commit files are
+# manifests listing the shas of the commits saved in the commit store.
+
+def find_commit_file(fileNameRoot):
+    # returns the existing commit file of the given root name, whatever its format, or None
+    extensions = commitFileExtensions
+    if store is not None:
+        extensions = ['.manifest.json'] + extensions
+    for extension in extensions:
+        if os.path.exists(fileNameRoot + extension):
+            return fileNameRoot + extension
+    return None
+
+def load_commits(fileName):
+    return commitFile(fileName, store)
+
+def save_commits(fileName, commits):
+    with commitWriter(fileName, store) as writer:
+        for commit in commits:
+            writer.write(commit)
+    return writer.count
+
+###################################################################################################################
+# FUNCTION find_missing_parents
+###################################################################################################################
+# Returns the references {'sha': ..., 'url': ...} of the parents of the given commits which have not been 
+# extracted, indexed by their sha. The commits are streamed once and looked up in the set 'knownCommits',
+# so that the check runs in linear time.
+
+def find_missing_parents(commits):
+    missing = {}
+    for commit in commits:
+        for parent in commit['parents']:
+            if not parent['sha'] in knownCommits and not parent['sha'] in missing:
+                missing[parent['sha']] = parent
+    return missing
+
+###################################################################################################################
+# FUNCTION repair_history
+###################################################################################################################
+# verify the extraction of commits has been correctly done
+# for some reason i don't know, sometimes the extraction stops unexpectedly
+# in these cases, there are commits whose parents are not in the commit list
+# The missing parents and their predecessors are extracted and written in the journal, until no parent 
+# is missing anymore or the missing parents cannot be extracted (e.g. they are not available anymore).
+# Heads of the crawl which could not be extracted are handled as missing parents.
+# The commits of the repository are given as an iterable which can be streamed several times.
+# Returns the number of extracted commits and the number of parents still missing.
+
+def repair_history(owner, repo, heads, commits, journal):
+    numberOfCommits = 0
+    missing = find_missing_parents(commits)
+    for head in heads:
+        if not head['sha'] in knownCommits:
+            missing[head['sha']] = head
+    while len(missing) != 0:
+        logger.warning("\t"+str(len(missing))+ " parent commits missing in repository '"+owner+"/"+repo+"', extracting them")
+        try:
+            if gitDir != '':
+                numberOfRepairedCommits = get_local_commits(owner, repo, list(missing.values()), journal)
+            else:
+                numberOfRepairedCommits = get_predecessors(list(missing.values()), auth, journal)
+        except Exception as e:
+            logger.error("unable to extract the missing parent commits of repository '"+owner+"/"+repo+"'. Error returned: " + str(e))
+            break
+        numberOfCommits += numberOfRepairedCommits
+        if numberOfRepairedCommits == 0:
+            break
+        missing = find_missing_parents(commits)
+    return numberOfCommits, len(missing)
+
+###################################################################################################################
+# FUNCTION check_parents
+###################################################################################################################
+# logs the parents which are still missing once the history has been repaired (see repair_history)
+# 'knownCommits' is the set of all commits extracted so far
+# yields the given commits, so that the check can be done while they are streamed into a file
+
+def check_parents(commits, repoReference):
+    for commit in commits:
+        for parent in commit['parents']:
+            if not parent['sha'] in knownCommits:
+                logger.error("commit '"+ parent['sha'] +"' is given as parent of '"+ commit['sha'] +"' but is not in the list of extracted commits of repository '"+ repoReference +"'")
+        yield commit
 
 #############################################################################################
 # INITIALISATION
 #############################################################################################
 
-# get command line arguments
-try:
-    options, remainder = getopt.getopt(sys.argv[1:], 'u:i:o:rdh', ['user=','input=', 'output=','rewrite','debug','help'])
-except getopt.GetoptError as err:
-    print(str(err))
-    sys.exit(2)
-
-# initialise the parameters to be found in the arguments
+# parameters of the extraction, read from the command line arguments (see read_arguments)
 username = ''
 CSVFileReference = ''
 outputDir = ''
 rewriteMode = False
+concurrency = 4
+poolSize = 0
+cacheDir = ''
+storeDir = ''
+incrementalMode = False
+forkDepth = -1
+fileFormat = '.commits.json'
+gitDir = ''
+cloneUrl = 'https://github.com'
+listingMode = False
+apiUrl = 'https://api.github.com'
+workers = 1
+estimateMode = False
+since = ''
+until = ''
+paths = []
+extensions = []
+retries = 5
+archiveFile = ''
+replayMode = False
+prometheusFile = ''
+schemaFile = ''
+keepPatches = False
 loggerMode = logging.INFO
+# names of the parameters given to the worker processes in parallel mode
+settingNames = ['username', 'CSVFileReference', 'outputDir', 'rewriteMode', 'concurrency', 'poolSize', 'cacheDir',
+                'storeDir', 'incrementalMode', 'forkDepth', 'fileFormat', 'gitDir', 'cloneUrl', 'listingMode', 'apiUrl',
+                'workers', 'since', 'until', 'paths', 'extensions', 'retries', 'archiveFile', 'replayMode', 'schemaFile', 'keepPatches', 'loggerMode']
 
-for option, argument in options:
-    if option in ('-u','--user'):
-        username = argument
-    if option in ('-i','--input'):
-        CSVFileReference = argument
-    if option in ('-o','--output'):
-        outputDir = argument
-    if option in ('-r','--rewrite'):
-        rewriteMode = True
-    if option in ('-h','--help'):
-        help()
-    if option in ('-d','--debug'):
-        loggerMode = logging.DEBUG
-
-# check whether all required parameters have been given as arguments and if not throw exception and abort
-if username == '':
-    print ("Argument required: GitHub username. Type '-u <username>' in the command line")
-    sys.exit(2)
-if CSVFileReference == '':
-    print ("Argument required: input CSV file. Type '-i <filepath>' in the command line")
-    sys.exit(2)
-if outputDir == '':
-    print ("Argument required: output directory. Type '-o <directory path>' in the command line")
-    sys.exit(2)
-    
-# initialise variables
-try:
-    auth = [username, open('.token','r').read()]
-except FileNotFoundError as err: #err never used?
-    print ("Can't start the extraction process. Token file missing. See documentation")
-    exit(2) 
-if not os.path.exists(outputDir):
-    os.makedirs(outputDir)
-t = timeStop()
-knownCommits = []
-    
-# initialise logger
+# state of the extraction process
 logger = logging.getLogger("mylogger")
-logger.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s :: %(levelname)s :: %(message)s')
-file_handler = RotatingFileHandler(os.path.join(outputDir, '_gomine'+datetime.datetime.now().strftime('_%y.%m.%d_%H.%M.%S')+'.log'), 'a', 1000000, 1)
-file_handler.setLevel(loggerMode)
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
-stream_handler = logging.StreamHandler()
-stream_handler.setLevel(loggerMode)
-logger.addHandler(stream_handler)
+knownCommits = set()
+store = None
+rateLimitLock = threading.Lock()
+metrics = apiMetrics()
+archive = None
+# seconds after which a request without answer is considered failed
+requestTimeout = 60
 
-#############################################################################################
-# BODY
-#############################################################################################
+###################################################################################################################
+# FUNCTION read_arguments
+###################################################################################################################
 
-logger.info("opening CSV file: "+CSVFileReference)
-if rewriteMode:
-    logger.info("starting extraction in rewrite mode")
-else:
-    logger.info("starting extraction in append mode")
-
-# parse the input file line per line and launch repo mining for each line
-with open(CSVFileReference, newline='') as csvInput:
-    CSVReader = csv.reader(csvInput, delimiter=';')
-    for row in CSVReader:
-        projectCommits = []
-        projectName = row[0]
-        for cell in row[1:]:
-            repoRefs = cell.split('/')
-            if len(repoRefs) == 2:
-                repoOwner = repoRefs[0]
-                repoName = repoRefs[1]
-                logger.info("start extraction repo "+repoOwner+"/"+repoName)
-                branchFileName = os.path.join(outputDir,projectName+"-"+repoOwner+"-"+repoName+".branches.json")
-                commitFileName = os.path.join(outputDir,projectName+"-"+repoOwner+"-"+repoName+".commits.json")
-
-                if not rewriteMode and os.path.exists(branchFileName):
-                    # load branches from json file
-                    logger.warning(branchFileName + " already exists. Branches references are loaded from this file. Please be aware this data may be outdated.")
-                    try:
-                        with open(branchFileName) as json_file:
-                            branches = json.load(json_file)
-                    except json.decoder.JSONDecodeError as err:
-                        logger.error("unable to decode json file '" + branchFileName + "'. Error returned: " + str(err))
+def read_arguments():
+    global username, CSVFileReference, outputDir, rewriteMode, concurrency, poolSize, cacheDir, storeDir, incrementalMode
+    global forkDepth, fileFormat, gitDir, cloneUrl, listingMode, apiUrl, workers, estimateMode, since, until, retries, archiveFile
+    global replayMode, prometheusFile, schemaFile, keepPatches, loggerMode
+    
+    # get command line arguments
+    try:
+        options, remainder = getopt.getopt(sys.argv[1:], 'u:i:o:rn:p:c:t:af:jzg:lw:es:kdh', ['user=','input=', 'output=','rewrite','concurrency=','poolsize=','cache=',
+                                                                                   'store=','incremental','forkdepth=','jsonl','gzip',
+                                                                                   'git=','cloneurl=','listing','workers=','estimate','since=','until=','path=','extension=','schema=','patches','retries=','record=','replay=','prometheus=',
+                                                                                   'api=','debug','help'])
+    except getopt.GetoptError as err:
+        print(str(err))
+        sys.exit(2)
+
+    for option, argument in options:
+        if option in ('-u','--user'):
+            username = argument
+        if option in ('-i','--input'):
+            CSVFileReference = argument
+        if option in ('-o','--output'):
+            outputDir = argument
+        if option in ('-r','--rewrite'):
+            rewriteMode = True
+        if option in ('-n','--concurrency'):
+            concurrency = int(argument)
+        if option in ('-p','--poolsize'):
+            poolSize = int(argument)
+        if option in ('-c','--cache'):
+            cacheDir = argument
+        if option in ('-t','--store'):
+            storeDir = argument
+        if option in ('-a','--incremental'):
+            incrementalMode = True
+        if option in ('-f','--forkdepth'):
+            forkDepth = int(argument)
+        if option in ('-j','--jsonl') and fileFormat == '.commits.json':
+            fileFormat = '.commits.jsonl'
+        if option in ('-z','--gzip'):
+            fileFormat = '.commits.jsonl.gz'
+        if option in ('-g','--git'):
+            gitDir = argument
+        if option == '--cloneurl':
+            cloneUrl = argument.rstrip('/')
+        if option in ('-l','--listing'):
+            listingMode = True
+        if option in ('-w','--workers'):
+            workers = int(argument)
+        if option == '--since':
+            since = argument
+        if option == '--until':
+            until = argument
+        if option == '--path':
+            paths.append(argument.strip('/'))
+        if option == '--extension':
+            extensions.append(argument.lower() if argument.startswith('.') else '.' + argument.lower())
+        if option in ('-e','--estimate'):
+            estimateMode = True
+        if option in ('-s','--schema'):
+            schemaFile = argument
+        if option in ('-k','--patches'):
+            keepPatches = True
+        if option == '--retries':
+            retries = int(argument)
+        if option == '--record':
+            archiveFile = argument
+        if option == '--replay':
+            archiveFile = argument
+            replayMode = True
+        if option == '--prometheus':
+            prometheusFile = argument
+        if option == '--api':
+            apiUrl = argument.rstrip('/')
+        if option in ('-h','--help'):
+            help()
+        if option in ('-d','--debug'):
+            loggerMode = logging.DEBUG
+
+    # check whether all required parameters have been given as arguments and if not throw exception and abort
+    if username == '' and gitDir == '':
+        print ("Argument required: GitHub username. Type '-u <username>' in the command line")
+        sys.exit(2)
+    if CSVFileReference == '':
+        print ("Argument required: input CSV file. Type '-i <filepath>' in the command line")
+        sys.exit(2)
+    if outputDir == '':
+        print ("Argument required: output directory. Type '-o <directory path>' in the command line")
+        sys.exit(2)
+
+###################################################################################################################
+# FUNCTION read_tokens
+###################################################################################################################
+# returns the list of logins [username, token] given in the token file
+
+def read_tokens():
+    try:
+        logins = []
+        with open('.token','r') as tokenFile:
+            for line in tokenFile:
+                if line.strip() == '':
+                    continue
+                if ':' in line:
+                    logins.append(line.strip().split(':',1))
                 else:
-                    # load branches from GitHub API
-                    logger.info(" - looking for branches")
-                    branches = get_all_branches(repoOwner, repoName, auth)
-                    with open(branchFileName, 'w') as json_file:
-                        json.dump(branches, json_file)
-                    logger.info("\t"+str(len(branches))+ " branches found")
-
-                if not rewriteMode and os.path.exists(commitFileName):
-                    # load commits from json file
-                    logger.warning(commitFileName + " already exists. Commits references are loaded from this file. Please be aware this data may be outdated.")
-                    try:
-                        with open(commitFileName) as json_file:
-                            commits = json.load(json_file)
-                    except json.decoder.JSONDecodeError as err:
-                        logger.error("unable to decode json file '" + commitFileName + "'. Error returned: " + str(err))
+                    logins.append([username, line.strip()])
+    except FileNotFoundError as err: #err never used?
+        # no token is needed to read a local clone or to replay an archive
+        if gitDir == '' and not replayMode:
+            print ("Can't start the extraction process. Token file missing. See documentation")
+            exit(2) 
+    if len(logins) == 0 and gitDir == '' and not replayMode:
+        print ("Can't start the extraction process. Token file empty. See documentation")
+        exit(2)
+    return logins
+
+###################################################################################################################
+# FUNCTION initialise
+###################################################################################################################
+# initialises the state of the extraction process: directories, commit store, HTTP session, token pool 
+# and logger. The rate limit budget of the tokens may be shared with other processes (see tokenPool.py).
+
+def initialise(logins, logFileName, budget=None, streamLevel=None):
+    global t, store, commitFileExtension, session, auth, poolSize, schema, controller, archive
+    
+    if not os.path.exists(outputDir):
+        os.makedirs(outputDir, exist_ok=True)
+    if cacheDir != '' and not os.path.exists(cacheDir):
+        os.makedirs(cacheDir, exist_ok=True)
+    t = timeStop()
+    if storeDir != '':
+        store = commitStore(storeDir)
+    commitFileExtension = ".manifest.json" if store is not None else fileFormat
+    schema = loadSchema(schemaFile, keepPatches)
+    if archiveFile != '':
+        archive = responseArchive(archiveFile, apiUrl)
+    auth = tokenPool(logins, budget=budget)
+
+    # initialise the HTTP session shared by all requests
+    if poolSize == 0:
+        poolSize = concurrency
+    controller = requestController(concurrency, retries)
+    session = requests.Session()
+    session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+    adapter = requests.adapters.HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    
+    # initialise logger
+    logger.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s :: %(levelname)s :: %(message)s')
+    file_handler = RotatingFileHandler(os.path.join(outputDir, logFileName), 'a', 1000000, 1)
+    file_handler.setLevel(loggerMode)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setLevel(loggerMode if streamLevel is None else streamLevel)
+    logger.addHandler(stream_handler)
+
+###################################################################################################################
+# FUNCTION initialise_worker
+###################################################################################################################
+# initialises a worker process in parallel mode: each worker has its own state and log file, the
+# rate limit budget is shared by all workers. Only warnings and errors are printed on the console.
+
+def initialise_worker(settings, logins, budget, logFileRoot):
+    globals().update(settings)
+    # forked workers inherit the handlers of the main process
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    initialise(logins, logFileRoot + '_worker' + str(os.getpid()) + '.log', budget, logging.WARNING)
+
+###################################################################################################################
+# FUNCTION mine_project
+###################################################################################################################
+# extracts branches and commits of all repositories of a project, given as a row of the input CSV file
+# returns a summary of the extraction
+
+def mine_project(row):
+    startTime = datetime.datetime.now()
+    repoCommitFiles = []
+    projectName = row[0]
+    numberOfExtractedCommits = 0
+    missingParents = 0
+    # the commits of a project are extracted independently from the other projects
+    knownCommits.clear()
+    metrics.reset()
+    
+    # files extracted with other filters are not reused
+    rewrite = rewriteMode
+    extract = extract_filter()
+    extractFileName = os.path.join(outputDir,projectName+".extract.json")
+    previousExtract = None
+    if os.path.exists(extractFileName):
+        with open(extractFileName) as json_file:
+            previousExtract = json.load(json_file)
+    elif extract is not None and not rewrite:
+        # a filtered extract does not overwrite the files of a full extraction, unless in rewrite mode
+        fileNameRoots = [projectName + ".aggregated"] + [projectName + "-" + cell.replace('/', '-') for cell in row[1:]]
+        if any(find_commit_file(os.path.join(outputDir, fileNameRoot)) is not None for fileNameRoot in fileNameRoots):
+            error = "the files of project " + projectName + " have been extracted without filters, they are not overwritten by a filtered extract (use -r to overwrite them)"
+            logger.error(error)
+            return {'project': projectName, 'repositories': 0, 'extracted_commits': 0, 'known_commits': 0, 'missing_parents': 0, 'seconds': 0,
+                    'requests': metrics.requests(), 'pause_seconds': int(metrics.pauseSeconds()), 'error': error,
+                    'metrics': metrics.report()}
+    if previousExtract != extract and not rewrite:
+        if previousExtract is not None:
+            logger.warning("the files of project " + projectName + " have been extracted with other filters, they are extracted again")
+        rewrite = True
+    for cell in row[1:]:
+        repoRefs = cell.split('/')
+        if len(repoRefs) == 2:
+            repoOwner = repoRefs[0]
+            repoName = repoRefs[1]
+            logger.info("start extraction repo "+repoOwner+"/"+repoName)
+            metrics.setScope(projectName, repoOwner+"/"+repoName)
+            branchFileName = os.path.join(outputDir,projectName+"-"+repoOwner+"-"+repoName+".branches.json")
+            commitFileName = os.path.join(outputDir,projectName+"-"+repoOwner+"-"+repoName+commitFileExtension)
+            existingCommitFileName = find_commit_file(os.path.join(outputDir,projectName+"-"+repoOwner+"-"+repoName))
+            journalFileName = os.path.join(outputDir,projectName+"-"+repoOwner+"-"+repoName+".journal.jsonl")
+
+            if not rewrite and not incrementalMode and os.path.exists(branchFileName):
+                # load branches from json file
+                logger.warning(branchFileName + " already exists. Branches references are loaded from this file. Please be aware this data may be outdated.")
+                try:
+                    with open(branchFileName) as json_file:
+                        branches = json.load(json_file)
+                except json.decoder.JSONDecodeError as err:
+                    logger.error("unable to decode json file '" + branchFileName + "'. Error returned: " + str(err))
+            else:
+                # load branches from GitHub API or from the local clone
+                logger.info(" - looking for branches")
+                if gitDir != '':
+                    branches = get_local_branches(repoOwner, repoName)
                 else:
-                    # load commits from GitHub API
-                    logger.info(" - parsing branches for commits")
-                    commits = []
-                    for branch in branches:
-                        logger.info("    . " + branch['name'])
-                        if not branch['commit']['sha'] in knownCommits:
-                            commitsToAdd = get_predecessors(branch['commit']['url'], auth)
-                            for commit in commitsToAdd:
-                                commits.append(commit)
-                    logger.info("\t"+str(len(commits))+ " commits extracted")
-                    """
-                    verify the extraction of commits has been correctly done
-                    for some reason i don't know, sometimes the extraction stops unexpectedly
-                    in these cases, there is one commit whose parent is not in the commit list
-                    """
-                    commitShaList = []
-                    for commit in commits:
-                        commitShaList.append(commit['sha'])
-                    for commit in commits:
-                        for parent in commit['parents']:
-                            if not parent['sha'] in commitShaList:
-                                logger.error("commit '"+ parent['sha'] +"' is given as parent of '"+ commit['sha'] +"' but is not in the list of extracted commits of repository '"+ repoOwner+"/"+repoName +"'")
-
-                    # write the commit json file
-                    with open(commitFileName, 'w') as json_file:
-                        json.dump(commits, json_file)
+                    branches = get_all_branches(repoOwner, repoName, auth)
+                with open(branchFileName, 'w') as json_file:
+                    json.dump(branches, json_file)
+                logger.info("\t"+str(len(branches))+ " branches found")
+
+            if not rewrite and not incrementalMode and existingCommitFileName is not None:
+                # load commits from json file
+                logger.warning(existingCommitFileName + " already exists. Commits references are loaded from this file. Please be aware this data may be outdated.")
+                try:
+                    knownCommits.update(commit['sha'] for commit in load_commits(existingCommitFileName))
+                    repoCommitFiles.append(existingCommitFileName)
+                except json.decoder.JSONDecodeError as err:
+                    logger.error("unable to decode json file '" + existingCommitFileName + "'. Error returned: " + str(err))
+            else:
+                existingCommits = []
+                if incrementalMode and not rewrite and existingCommitFileName is not None:
+                    # only commits newer than the already extracted ones will be fetched
+                    existingCommits = load_commits(existingCommitFileName)
+                    numberOfCommits = 0
+                    for commit in existingCommits:
+                        knownCommits.add(commit['sha'])
+                        numberOfCommits += 1
+                    logger.info("\t"+str(numberOfCommits)+ " commits loaded from " + existingCommitFileName)
+                
+                # resume an interrupted extraction from the journal (in rewrite mode or once the filters changed,
+                # everything is extracted again)
+                frontier = []
+                if rewrite and os.path.exists(journalFileName):
+                    os.remove(journalFileName)
+                if os.path.exists(journalFileName):
+                    numberOfCommits, frontier = resume_journal(journalFileName)
+                    logger.info("\t"+str(numberOfCommits)+ " commits resumed from " + journalFileName)
+                
+                # load commits from GitHub API
+                logger.info(" - parsing branches for commits")
+                heads = []
+                for branch in branches:
+                    logger.info("    . " + branch['name'])
+                    if not branch['commit']['sha'] in knownCommits:
+                        heads.append(branch['commit'])
+                # frontier of the interrupted extraction (parents are not followed in a filtered extract)
+                if extract is None:
+                    heads.extend(parent for parent in frontier if not parent['sha'] in knownCommits)
+                
+                with open(journalFileName, 'a') as journal:
+                    if gitDir != '':
+                        numberOfCommits = get_local_commits(repoOwner, repoName, heads, journal)
+                    elif extract is not None:
+                        # only the details of the commits passing the filters of the listing are fetched
+                        skeleton = list_filtered(heads, auth)
+                        logger.info("\t"+str(len(skeleton))+ " commits listed")
+                        numberOfCommits = fetch_commits([commit for commit in skeleton if not commit['sha'] in knownCommits], auth, journal)
+                    elif listingMode and not incrementalMode:
+                        # phase 1: skeleton of the history, phase 2: details of the unknown commits
+                        skeleton = list_history(heads, auth)
+                        logger.info("\t"+str(len(skeleton))+ " commits listed")
+                        numberOfCommits = fetch_commits([commit for commit in skeleton if not commit['sha'] in knownCommits], auth, journal)
+                    else:
+                        # the crawl stops at already extracted commits, so that only new commits are requested
+                        numberOfCommits = get_predecessors(heads, auth, journal)
+                    logger.info("\t"+str(numberOfCommits)+ " commits extracted")
                     
-                for commit in commits:
-                    projectCommits.append(commit)
-                logger.info("\t"+t.stop())
-            else :
-                logger.error("wrong cell format, should be 'username' '/' 'repository' - line ignored: '"+ str(cell) +"'")
-        
-        # write the aggregated commit file containing all commits of all repositories related to one project
-        aggregatedCommitFileName = os.path.join(outputDir,projectName+".aggregated.commits.json")
-        if rewriteMode or not os.path.exists(aggregatedCommitFileName):
-            with open(aggregatedCommitFileName, 'w') as json_file:
-                json.dump(projectCommits, json_file)
-            logger.info("created aggregated commit file "+ aggregatedCommitFileName)
+                    # verify that the parents of all commits have been extracted before the commit file is written
+                    # (in a filtered extract, parents are missing by design)
+                    commits = commitChain([existingCommits, commitFile(journalFileName)])
+                    if extract is None:
+                        numberOfRepairedCommits, numberOfMissingParents = repair_history(repoOwner, repoName, heads, commits, journal)
+                        if numberOfRepairedCommits != 0:
+                            logger.info("\t"+str(numberOfRepairedCommits)+ " missing commits extracted")
+                        numberOfCommits += numberOfRepairedCommits
+                        missingParents += numberOfMissingParents
+                numberOfExtractedCommits += numberOfCommits
+
+                # stream the existing and the journaled commits into the commit file, the journal is not needed anymore
+                if extract is None:
+                    save_commits(commitFileName, check_parents(commits, repoOwner+"/"+repoName))
+                else:
+                    save_commits(commitFileName, filter_commits(commits))
+                os.remove(journalFileName)
+                if existingCommitFileName is not None and existingCommitFileName != commitFileName:
+                    os.remove(existingCommitFileName)
+                repoCommitFiles.append(commitFileName)
+                
+            logger.info("\t"+t.stop())
+        else :
+            logger.error("wrong cell format, should be 'username' '/' 'repository' - line ignored: '"+ str(cell) +"'")
+    
+    # write the aggregated commit file containing all commits of all repositories related to one project
+    aggregatedCommitFileName = os.path.join(outputDir,projectName+".aggregated"+commitFileExtension)
+    if rewrite or incrementalMode or not os.path.exists(aggregatedCommitFileName):
+        save_commits(aggregatedCommitFileName, itertools.chain.from_iterable(load_commits(fileName) for fileName in repoCommitFiles))
+        logger.info("created aggregated commit file "+ aggregatedCommitFileName)
+    # the aggregated commit file written in another format by a previous run is superseded
+    for extension in ['.manifest.json'] + commitFileExtensions:
+        otherFileName = os.path.join(outputDir,projectName+".aggregated"+extension)
+        if otherFileName != aggregatedCommitFileName and os.path.exists(otherFileName):
+            os.remove(otherFileName)
+            logger.info("removed superseded aggregated commit file "+ otherFileName)
+
+    if archive is not None:
+        logger.info("response archive: " + str(archive.hits) + " responses replayed, " + str(archive.recorded) + " responses recorded")
+    
+    # describe the filters of the extract, so that the analysis scripts know the histories are not complete
+    if extract is not None:
+        with open(extractFileName, 'w') as json_file:
+            json.dump(extract, json_file)
+    elif os.path.exists(extractFileName):
+        os.remove(extractFileName)
+    
+    return {'project': projectName,
+            'repositories': len(repoCommitFiles),
+            'extracted_commits': numberOfExtractedCommits,
+            'known_commits': len(knownCommits),
+            'missing_parents': missingParents,
+            'seconds': int((datetime.datetime.now() - startTime).total_seconds()),
+            'requests': metrics.requests(),
+            'pause_seconds': int(metrics.pauseSeconds()),
+            'error': '',
+            'metrics': metrics.report()}
+
+###################################################################################################################
+# FUNCTION run_project
+###################################################################################################################
+# extracts a project, errors are logged and reported in the summary of the project
+# instead of stopping the extraction of the other projects
+
+def run_project(row):
+    try:
+        return mine_project(row)
+    except Exception as e:
+        logger.exception("extraction of project '" + row[0] + "' aborted")
+        return {'project': row[0], 'repositories': 0, 'extracted_commits': 0, 'known_commits': 0, 'missing_parents': 0, 'seconds': 0,
+                'requests': metrics.requests(), 'pause_seconds': int(metrics.pauseSeconds()), 'error': str(e),
+                'metrics': metrics.report()}
+
+#############################################################################################
+# BODY
+#############################################################################################
+
+if __name__ == '__main__':
+    
+    read_arguments()
+    logins = read_tokens()
+    logFileRoot = '_gomine'+datetime.datetime.now().strftime('_%y.%m.%d_%H.%M.%S')
+    initialise(logins, logFileRoot + '.log')
+
+    logger.info("opening CSV file: "+CSVFileReference)
+    if estimateMode:
+        logger.info("estimating the cost of the extraction (dry run)")
+    elif rewriteMode:
+        logger.info("starting extraction in rewrite mode")
+    elif incrementalMode:
+        logger.info("starting extraction in incremental mode")
+    else:
+        logger.info("starting extraction in append mode")
+
+    # read the input file, each line is a project
+    with open(CSVFileReference, newline='') as csvInput:
+        rows = [row for row in csv.reader(csvInput, delimiter=';') if len(row) != 0]
+    
+    if estimateMode:
+        # dry run: estimate the cost of each project and exit
+        if gitDir != '':
+            print ("The estimation is only available for the extraction with the GitHub API")
+            sys.exit(2)
+        estimates = []
+        for row in rows:
+            logger.info("estimating extraction of project " + row[0])
+            estimates.append(estimate_project(row))
+        print_plan(estimates, os.path.join(outputDir, logFileRoot + '.plan.csv'))
+        sys.exit()
+
+    if workers <= 1:
+        # launch repo mining for each line, one after the other
+        summaries = [run_project(row) for row in rows]
+    else:
+        # launch repo mining for each line in a pool of worker processes sharing the rate limit budget
+        logger.info("mining " + str(len(rows)) + " projects with " + str(workers) + " worker processes (see " + logFileRoot + "_worker<pid>.log)")
+        summaries = []
+        with multiprocessing.Manager() as manager:
+            budget = newBudget(logins, manager=manager)
+            settings = {name: globals()[name] for name in settingNames}
+            with multiprocessing.Pool(workers, initialise_worker, (settings, logins, budget, logFileRoot)) as pool:
+                for summary in pool.imap_unordered(run_project, rows):
+                    logger.info("project " + summary['project'] + " done: " + str(summary['extracted_commits']) + " commits extracted " + summary['error'])
+                    summaries.append(summary)
+
+    # write the consolidated summary of the extraction
+    summaryFileName = os.path.join(outputDir, logFileRoot + '.summary.csv')
+    with open(summaryFileName, 'w', newline='') as csvOutput:
+        CSVWriter = csv.writer(csvOutput, delimiter=';')
+        CSVWriter.writerow(['project', 'repositories', 'extracted_commits', 'known_commits', 'missing_parents', 'seconds', 'requests',
+                            'pause_seconds', 'error'])
+        for summary in summaries:
+            CSVWriter.writerow([summary['project'], summary['repositories'], summary['extracted_commits'], 
+                                summary['known_commits'], summary['missing_parents'], summary['seconds'], summary['requests'],
+                                summary['pause_seconds'], summary['error']])
+    logger.info(str(len(summaries)) + " projects extracted, " + str(sum(summary['extracted_commits'] for summary in summaries)) + " commits extracted. Summary written in " + summaryFileName)
+
+    # write the report of the requests sent to the GitHub API by all projects
+    runMetrics = apiMetrics()
+    for summary in summaries:
+        runMetrics.merge(summary['metrics'])
+    metricsFileName = os.path.join(outputDir, logFileRoot + '.metrics.json')
+    runMetrics.writeReport(metricsFileName)
+    if prometheusFile != '':
+        runMetrics.writePrometheus(prometheusFile)
+    logger.info(str(runMetrics.requests()) + " requests sent, " + str(int(runMetrics.pauseSeconds())) + " seconds waited for rate limit resets and retries. Metrics written in " + metricsFileName)
@@ -0,0 +1,127 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+#---------------------
+# identityResolver.py
+# Delivers the resolution of the names, emails and logins used by the contributors of a project
+# into one identity per contributor
+# Author: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# Contributors often commit under several names, emails or logins (e.g. from several machines or
+# from the web interface). Two aliases are merged into one identity as soon as they are used by the
+# same author of a commit: the author name, email and login of every commit are united in a
+# union-find structure indexed by hash tables, so that adding and resolving a commit take constant
+# time. The committer of a commit is registered as an identity of its own (it is not the author when
+# a commit is applied by someone else, e.g. by GitHub when merging a pull request).
+# The name of an identity is the first author name under which it has been seen, its color is
+# derived from a hash of this name, so that repeated runs give identical colors.
+# The identities can be saved in a JSON file, a list of objects with the fields 'name', 'color',
+# 'names', 'emails' and 'logins'. A saved file can be edited to merge identities by hand (by moving
+# aliases from one object to another) and loaded again before adding the commits.
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+import json
+import hashlib
+
+def identityColor(name):
+    # returns a color with r,g,b values between 90 and 255 derived from the name
+    digest = hashlib.md5(name.encode()).digest()
+    return '#%02X%02X%02X' % tuple(90 + byte % 166 for byte in digest[:3])
+
+def commitAliases(commit, role):
+    # returns the name, email and login of the author or the committer (role) of a commit
+    person = commit['commit'][role] or {}
+    account = commit.get(role) or {}
+    return person.get('name') or '', person.get('email') or '', account.get('login') or ''
+
+class identityResolver:
+    def __init__(self, commits=[]):
+        self.parent = {}    # alias -> parent alias in the union-find structure
+        self.seen = {}      # alias -> order of first appearance
+        self.name = {}      # root alias -> (order, name) of the first name of the identity
+        for commit in commits:
+            self.addCommit(commit)
+    def find(self, alias):
+        root = alias
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[alias] != root:
+            self.parent[alias], alias = root, self.parent[alias]
+        return root
+    def union(self, first, second):
+        first = self.find(first)
+        second = self.find(second)
+        if first == second:
+            return first
+        # the alias seen first stays the root, so that the identity keeps its first name
+        if self.seen[second] < self.seen[first]:
+            first, second = second, first
+        self.parent[second] = first
+        name = self.name.pop(second, None)
+        if name is not None and (not first in self.name or name < self.name[first]):
+            self.name[first] = name
+        return first
+    def addAlias(self, alias):
+        if not alias in self.parent:
+            self.parent[alias] = alias
+            self.seen[alias] = len(self.seen)
+            if alias.startswith('name:'):
+                self.name[alias] = (self.seen[alias], alias[5:])
+        return alias
+    def merge(self, names=[], emails=[], logins=[]):
+        # merges the aliases given in one identity and returns its root alias (None if no alias is given)
+        root = None
+        for kind, values in (('name', names), ('email', emails), ('login', logins)):
+            for value in values:
+                if value != '':
+                    alias = self.addAlias(kind + ':' + value)
+                    root = alias if root is None else self.union(root, alias)
+        return root
+    def add(self, name='', email='', login=''):
+        return self.merge([name], [email], [login])
+    def addCommit(self, commit):
+        self.add(*commitAliases(commit, 'author'))
+        self.add(*commitAliases(commit, 'committer'))
+    def root(self, name='', email='', login=''):
+        for alias in ('name:' + name, 'email:' + email, 'login:' + login):
+            if alias in self.parent:
+                return self.find(alias)
+        return None
+    def identityName(self, root):
+        if root in self.name:
+            return self.name[root][1]
+        return root.split(':', 1)[1]
+    def resolve(self, commit, role='author'):
+        # returns the name and the color of the identity of the author (or committer) of a commit
+        name, email, login = commitAliases(commit, role)
+        root = self.root(name, email, login)
+        if root is not None:
+            name = self.identityName(root)
+        return name, identityColor(name)
+    def identities(self):
+        # returns the identities sorted by name, with their aliases
+        identities = {}
+        for alias in sorted(self.parent, key=lambda alias: self.seen[alias]):
+            root = self.find(alias)
+            if not root in identities:
+                name = self.identityName(root)
+                identities[root] = {'name': name, 'color': identityColor(name), 'names': [], 'emails': [], 'logins': []}
+            kind, value = alias.split(':', 1)
+            identities[root][kind + 's'].append(value)
+        return sorted(identities.values(), key=lambda identity: (identity['name'], identity['names'], identity['emails']))
+    def save(self, fileName):
+        with open(fileName, 'w', encoding='utf-8') as json_file:
+            json.dump(self.identities(), json_file, indent=1, ensure_ascii=False)
+    def load(self, fileName):
+        # adds the identities saved in a file, the name of each identity being its first name
+        with open(fileName, encoding='utf-8') as json_file:
+            identities = json.load(json_file)
+        for identity in identities:
+            self.merge([identity['name']] + identity['names'], identity['emails'], identity['logins'])
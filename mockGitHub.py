@@ -0,0 +1,386 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+# ---------------------
+# mockGitHub.py
+# local stand-in for the GitHub API serving synthetic repositories, forks, branches and commits,
+# used to measure the performance of goMine.py without using the quota of real GitHub accounts
+# Authors: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# SERVED ENDPOINTS:
+# -----------------
+# - /repos/<owner>/<repo>                       repository information (incl. forks_count)
+# - /repos/<owner>/<repo>/branches              branches, paginated
+# - /repos/<owner>/<repo>/forks                 forks, paginated
+# - /repos/<owner>/<repo>/commits?sha=<sha>     commit listing, paginated, newest first, filtered by the
+#                                               parameters since, until and path as GitHub does
+# - /repos/<owner>/<repo>/commits/<sha>         commit details incl. file changes
+# - /rate_limit                                 rate limit of the token (not counted)
+# Each response carries rate limit headers (X-RateLimit-Limit, -Remaining, -Reset) counted per token,
+# an ETag (conditional requests are answered with a 304) and Link headers for paginated resources.
+# To simulate an unreliable server, a share of the requests can be answered with a '502 Bad Gateway'
+# (without rate limit headers, 'errorRate') or throttled by a secondary rate limit (403 with a
+# 'Retry-After' header, 'throttleRate').
+#
+# SYNTHETIC DATA:
+# ---------------
+# The root repositories are named mock/repo<i>. Each repository has 'forks' forks, named
+# fork<k>/repo<i> (fork<k>-<l>/repo<i> for forks of forks, up to 'forkDepth' levels). A fork shares
+# the history of its parent and adds 'forkCommits' commits on top of it. The history of a root
+# repository has 'commits' commits, either linear or with a merge every 'mergeEvery' commits.
+#
+# ARGUMENTS:
+# ----------
+# see help() function (when used as a script)
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+# standard python libraries
+import time
+import json
+import random
+import hashlib
+import threading
+from datetime import datetime, timezone
+from getopt import getopt, GetoptError
+from sys import exit, argv
+from collections import Counter
+from urllib.parse import urlparse, parse_qs, quote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+#############################################################################################
+# FUNCTION help
+#############################################################################################
+
+def help():
+    print('Optional Arguments:')
+    print('-p     --port <n>           port of the server (default: 8000)')
+    print('       --repos <n>          number of root repositories (default: 1)')
+    print('       --commits <n>        number of commits of each root repository (default: 1000)')
+    print('       --shape <shape>      shape of the history: linear or merges (default: linear)')
+    print('       --forks <n>          number of forks of each repository (default: 0)')
+    print('       --forkdepth <n>      number of levels of forks (default: 1)')
+    print('       --forkcommits <n>    number of commits added by each fork (default: 10)')
+    print('       --branches <n>       number of branches of each root repository (default: 1)')
+    print('       --files <n>          number of file changes per commit (default: 3)')
+    print('       --latency <s>        latency added to each response in seconds (default: 0)')
+    print('       --ratelimit <n>      number of allowed requests per token and window (default: 5000)')
+    print('       --ratewindow <s>     length of the rate limit window in seconds (default: 3600)')
+    print('       --errorrate <x>      share of requests answered with a server error (default: 0)')
+    print('       --throttlerate <x>   share of requests throttled by a secondary rate limit (default: 0)')
+    print('-h     --help               calls help function')
+    exit()
+
+###################################################################################################################
+# CLASS mockGitHub
+###################################################################################################################
+
+class mockGitHub:
+
+    extensions = ['.stl', '.scad', '.kicad_pcb', '.md', '.png', '.c', '.txt']
+
+    def __init__(self, repos=1, commits=1000, shape='linear', mergeEvery=10, forks=0, forkDepth=1, forkCommits=10,
+                 branches=1, filesPerCommit=3, patchSize=200, authors=5, latency=0.0, rateLimit=5000, rateWindow=3600,
+                 perPageMax=100, errorRate=0.0, throttleRate=0.0, retryAfter=1, port=0):
+        self.latency = latency
+        self.errorRate = errorRate
+        self.throttleRate = throttleRate
+        self.retryAfter = retryAfter
+        self.random = random.Random(0)
+        self.rateLimit = rateLimit
+        self.rateWindow = rateWindow
+        self.filesPerCommit = filesPerCommit
+        self.patchSize = patchSize
+        self.authors = authors
+        self.perPageMax = perPageMax
+        self.port = port
+        self.lock = threading.Lock()
+        self.resetStats()
+        self.tokens = {}
+        # commits[sha] = (index, parent shas, repository where the commit was created)
+        self.commits = {}
+        # repositories[(owner, name)] = {'head': sha, 'branches': [(name, sha)], 'forks': [(owner, name)]}
+        self.repositories = {}
+        self.listings = {}
+        for i in range(repos):
+            name = "repo" + str(i)
+            history = []
+            for j in range(commits):
+                parents = [history[-1]] if history else []
+                if shape == 'merges' and j % mergeEvery == mergeEvery - 1 and j >= 3:
+                    parents.append(history[-3])
+                history.append(self.addCommit(("mock", name), j, parents))
+            branchHeads = [("master", history[-1])]
+            for k in range(1, branches):
+                branchHeads.append(("branch" + str(k), history[max(0, len(history) - 1 - 7 * k)]))
+            self.repositories[("mock", name)] = {'head': history[-1], 'branches': branchHeads, 'forks': []}
+            self.addForks(("mock", name), history[-1], commits, forks, forkDepth, forkCommits, "fork")
+
+    def addCommit(self, repository, index, parents):
+        sha = hashlib.sha1((repository[0] + "/" + repository[1] + "#" + str(index)).encode()).hexdigest()
+        self.commits[sha] = (index, parents, repository)
+        return sha
+
+    def addForks(self, parent, head, firstIndex, forks, forkDepth, forkCommits, prefix):
+        if forkDepth <= 0:
+            return
+        for k in range(forks):
+            fork = (prefix + str(k), parent[1])
+            forkHead = head
+            for j in range(forkCommits):
+                forkHead = self.addCommit(fork, firstIndex + j, [forkHead])
+            self.repositories[fork] = {'head': forkHead, 'branches': [("master", forkHead)], 'forks': []}
+            self.repositories[parent]['forks'].append(fork)
+            self.addForks(fork, forkHead, firstIndex + forkCommits, forks, forkDepth - 1, forkCommits, fork[0] + "-")
+
+    def networkCount(self, repository):
+        # number of forks of the fork network of the root repository
+        root = ("mock", repository[1])
+        return sum(1 for fork in self.repositories if fork[1] == root[1] and fork != root)
+
+    def numberOfCommits(self):
+        return len(self.commits)
+
+    def resetStats(self):
+        with self.lock:
+            self.requests = Counter()
+            self.bytes = 0
+
+    ####### server
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', self.port), self.handler())
+        self.url = "http://127.0.0.1:" + str(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handler(self):
+        mock = self
+        class handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            def log_message(self, format, *args):
+                pass
+            def do_GET(self):
+                mock.serve(self)
+        return handler
+
+    ####### rate limit
+
+    def rate(self, token, count=True):
+        with self.lock:
+            now = time.time()
+            remaining, reset = self.tokens.get(token, (self.rateLimit, now + self.rateWindow))
+            if reset <= now:
+                remaining, reset = self.rateLimit, now + self.rateWindow
+            if count:
+                remaining -= 1
+            self.tokens[token] = (remaining, reset)
+            return remaining, int(reset)
+
+    ####### resources
+
+    def commitUrl(self, repository, sha):
+        return self.url + "/repos/" + repository[0] + "/" + repository[1] + "/commits/" + sha
+
+    def date(self, index):
+        return datetime.fromtimestamp(1262304000 + 3600 * index, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def commitData(self, repository, sha, details):
+        index, parents, origin = self.commits[sha]
+        # commits of a fork are authored by the owner of the fork
+        author = "author" + str(index % self.authors) if origin[0] == "mock" else origin[0]
+        person = {'name': author.capitalize(), 'email': author + "@example.org", 'date': self.date(index)}
+        commit = {'sha': sha,
+                  'url': self.commitUrl(repository, sha),
+                  'html_url': "https://github.com/" + repository[0] + "/" + repository[1] + "/commit/" + sha,
+                  'commit': {'author': person, 'committer': person, 'message': "commit " + str(index),
+                             'url': self.url + "/repos/" + repository[0] + "/" + repository[1] + "/git/commits/" + sha},
+                  'author': {'login': author},
+                  'committer': {'login': author},
+                  'parents': [{'sha': parent, 'url': self.commitUrl(repository, parent)} for parent in parents]}
+        if details:
+            files = []
+            for j, filename in enumerate(self.fileNames(index)):
+                files.append({'sha': hashlib.sha1((sha + filename).encode()).hexdigest(),
+                              'filename': filename,
+                              'status': 'added' if index == j else 'modified',
+                              'additions': 1, 'deletions': 1, 'changes': 2,
+                              'blob_url': "https://github.com/" + repository[0] + "/" + repository[1] + "/blob/" + sha + "/" + filename,
+                              'raw_url': "https://github.com/" + repository[0] + "/" + repository[1] + "/raw/" + sha + "/" + filename,
+                              'patch': "@@ -1 +1 @@\n-" + "x" * (self.patchSize // 2) + "\n+" + "y" * (self.patchSize // 2)})
+            commit['stats'] = {'total': 2 * len(files), 'additions': len(files), 'deletions': len(files)}
+            commit['files'] = files
+        return commit
+
+    def fileNames(self, index):
+        # names of the files changed by the commit with the given index
+        fileNames = []
+        for j in range(self.filesPerCommit):
+            fileNumber = (index + j) % (3 * self.filesPerCommit + 1)
+            fileNames.append("part" + str(fileNumber) + self.extensions[fileNumber % len(self.extensions)])
+        return fileNames
+
+    def filtered(self, sha, query):
+        # whether the commit passes the filters of the commit listing (dates are compared as ISO 8601 strings)
+        index = self.commits[sha][0]
+        if 'since' in query and self.date(index) < query['since'][0]:
+            return False
+        if 'until' in query and self.date(index) > query['until'][0]:
+            return False
+        if 'path' in query:
+            path = query['path'][0].strip('/')
+            return any(filename == path or filename.startswith(path + "/") for filename in self.fileNames(index))
+        return True
+
+    def listing(self, head):
+        # commits reachable from the head, newest first
+        with self.lock:
+            if not head in self.listings:
+                reachable, stack = set(), [head]
+                while stack:
+                    sha = stack.pop()
+                    if not sha in reachable:
+                        reachable.add(sha)
+                        stack.extend(self.commits[sha][1])
+                self.listings[head] = sorted(reachable, key=lambda sha: self.commits[sha][0], reverse=True)
+            return self.listings[head]
+
+    def resource(self, path, query):
+        # returns (endpoint class, body or None if not found, full list to be paginated or None)
+        parts = path.strip('/').split('/')
+        if parts == ['rate_limit']:
+            return 'rate_limit', {}, None
+        if len(parts) < 3 or parts[0] != 'repos' or not (parts[1], parts[2]) in self.repositories:
+            return 'other', None, None
+        repository = (parts[1], parts[2])
+        repo = self.repositories[repository]
+        if len(parts) == 3:
+            return 'repo', {'full_name': parts[1] + "/" + parts[2], 'name': parts[2], 'owner': {'login': parts[1]},
+                            'fork': parts[1] != "mock", 'forks_count': len(repo['forks']), 'default_branch': "master",
+                            'network_count': self.networkCount(repository)}, None
+        if parts[3] == 'branches' and len(parts) == 4:
+            return 'branches', None, [{'name': name, 'commit': {'sha': sha, 'url': self.commitUrl(repository, sha)}}
+                                      for name, sha in repo['branches']]
+        if parts[3] == 'forks' and len(parts) == 4:
+            return 'forks', None, [{'name': fork[1], 'full_name': fork[0] + "/" + fork[1], 'owner': {'login': fork[0]},
+                                    'forks_count': len(self.repositories[fork]['forks'])} for fork in repo['forks']]
+        if parts[3] == 'commits' and len(parts) == 4:
+            head = query.get('sha', [repo['head']])[0]
+            # the listing may start from a branch name
+            head = dict(repo['branches']).get(head, head)
+            if not head in self.commits:
+                return 'commits', None, None
+            return 'commits', None, [self.commitData(repository, sha, False) for sha in self.listing(head) if self.filtered(sha, query)]
+        if parts[3] == 'commits' and len(parts) == 5 and parts[4] in self.commits:
+            return 'commit', self.commitData(repository, parts[4], True), None
+        return 'other', None, None
+
+    def serve(self, request):
+        time.sleep(self.latency)
+        url = urlparse(request.path)
+        query = parse_qs(url.query)
+        endpoint, body, items = self.resource(url.path, query)
+        with self.lock:
+            draw = self.random.random()
+        if draw < self.errorRate:
+            self.send(request, endpoint, 502, {'Content-Type': 'application/json; charset=utf-8'},
+                      json.dumps({'message': "Server Error"}).encode())
+            return
+        remaining, reset = self.rate(request.headers.get('Authorization'), endpoint != 'rate_limit')
+        headers = {'Content-Type': 'application/json; charset=utf-8',
+                   'X-RateLimit-Limit': str(self.rateLimit),
+                   'X-RateLimit-Remaining': str(max(remaining, 0)),
+                   'X-RateLimit-Reset': str(reset)}
+        status = 200
+        if remaining < 0:
+            status, body = 403, {'message': "API rate limit exceeded"}
+        elif draw < self.errorRate + self.throttleRate:
+            status, body = 403, {'message': "You have exceeded a secondary rate limit. Please wait a few minutes before you try again."}
+            headers['Retry-After'] = str(self.retryAfter)
+        elif items is not None:
+            # pagination
+            perPage = min(int(query.get('per_page', ['30'])[0]), self.perPageMax)
+            page = int(query.get('page', ['1'])[0])
+            lastPage = max(1, (len(items) + perPage - 1) // perPage)
+            body = items[(page - 1) * perPage:page * perPage]
+            links = []
+            pageUrl = lambda n: self.url + url.path + "?" + "&".join(k + "=" + quote(v[0]) for k, v in query.items() if k != 'page') + "&page=" + str(n)
+            if page < lastPage:
+                links.append('<' + pageUrl(page + 1) + '>; rel="next"')
+                links.append('<' + pageUrl(lastPage) + '>; rel="last"')
+            if links:
+                headers['Link'] = ", ".join(links)
+        elif body is None:
+            status, body = 404, {'message': "Not Found"}
+        data = json.dumps(body).encode()
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        if status == 200:
+            headers['ETag'] = etag
+            if request.headers.get('If-None-Match') == etag:
+                status, data = 304, b''
+        self.send(request, endpoint, status, headers, data)
+
+    def send(self, request, endpoint, status, headers, data):
+        headers['Content-Length'] = str(len(data))
+        with self.lock:
+            self.requests[endpoint] += 1
+            self.requests[str(status)] += 1
+            self.bytes += len(data)
+        request.send_response(status)
+        for key, value in headers.items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(data)
+
+###################################################################################################################
+# BODY
+###################################################################################################################
+
+if __name__ == '__main__':
+
+    # get command line arguments
+    try:
+        options, remainder = getopt(argv[1:], 'p:h', ['port=', 'repos=', 'commits=', 'shape=', 'forks=', 'forkdepth=',
+                                                      'forkcommits=', 'branches=', 'files=', 'latency=', 'ratelimit=',
+                                                      'ratewindow=', 'errorrate=', 'throttlerate=', 'help'])
+    except GetoptError as err:
+        print(str(err))
+        exit(2)
+
+    parameters = {'port': 8000}
+    names = {'--repos': 'repos', '--commits': 'commits', '--forks': 'forks', '--forkdepth': 'forkDepth',
+             '--forkcommits': 'forkCommits', '--branches': 'branches', '--files': 'filesPerCommit',
+             '--ratelimit': 'rateLimit', '--ratewindow': 'rateWindow'}
+    for option, argument in options:
+        if option in ('-p', '--port'):
+            parameters['port'] = int(argument)
+        elif option in names:
+            parameters[names[option]] = int(argument)
+        elif option == '--shape':
+            parameters['shape'] = argument
+        elif option == '--latency':
+            parameters['latency'] = float(argument)
+        elif option == '--errorrate':
+            parameters['errorRate'] = float(argument)
+        elif option == '--throttlerate':
+            parameters['throttleRate'] = float(argument)
+        elif option in ('-h', '--help'):
+            help()
+
+    mock = mockGitHub(**parameters)
+    print("serving " + str(len(mock.repositories)) + " repositories and " + str(mock.numberOfCommits()) + " commits at " + mock.start())
+    try:
+        mock.thread.join()
+    except KeyboardInterrupt:
+        mock.stop()
@@ -0,0 +1,86 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+#---------------------
+# renameLineage.py
+# Delivers the lineage of the files of a project through the renames recorded in its commits
+# Author: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# The GitHub API gives a renamed file under its new path, with the status 'renamed' and the old path
+# as 'previous_filename'. The lineage indexes every rename by the new path and the sha of the commit,
+# and keeps the renames to and from every path sorted by date, so that the previous paths of a file
+# at any point of time are found by hash lookups and binary searches. Chains of renames (A -> B -> C)
+# and renames back (A -> B -> A) are followed backwards in time, so that walking the lineage always
+# terminates.
+# Dates are the sort keys of changeDate: the author date, then the committer date (rebased commits
+# share their author date).
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+from bisect import bisect_left, insort
+from datetime import datetime
+
+def changeDate(commit):
+    # returns the key by which the changes made by a commit are sorted in time
+    return (datetime.strptime(commit['commit']['author']['date'], '%Y-%m-%dT%H:%M:%SZ'), commit['commit']['committer']['date'])
+
+class renameLineage:
+    def __init__(self, commits=[]):
+        self.renames = {}       # (path, sha) -> (date, previous path)
+        self.predecessors = {}  # path -> sorted list of (date, sha, previous path)
+        self.successors = {}    # path -> sorted list of (date, sha, next path)
+        for commit in commits:
+            self.addCommit(commit)
+    def add(self, date, sha, previousPath, path):
+        if (path, sha) in self.renames:
+            return
+        self.renames[(path, sha)] = (date, previousPath)
+        insort(self.predecessors.setdefault(path, []), (date, sha, previousPath))
+        insort(self.successors.setdefault(previousPath, []), (date, sha, path))
+    def addCommit(self, commit):
+        renamed = [file for file in commit.get('files') or [] if file.get('status') == 'renamed' and file.get('previous_filename')]
+        if renamed != []:
+            date = changeDate(commit)
+            for file in renamed:
+                self.add(date, commit['sha'], file['previous_filename'], file['filename'])
+    def previousPath(self, path, sha):
+        # returns the path of the file before it was renamed to path in the commit sha (None if it was not renamed)
+        rename = self.renames.get((path, sha))
+        return None if rename is None else rename[1]
+    def lastRename(self, path, date):
+        # returns the last rename to path before the date as (date, previous path), or None
+        renames = self.predecessors.get(path, [])
+        index = bisect_left(renames, (date,))
+        return None if index == 0 else renames[index-1][::2]
+    def ancestors(self, path, sha):
+        # yields the successive previous paths of the file renamed to path in the commit sha, the closest
+        # first, each with the date at which the file was renamed from it
+        rename = self.renames.get((path, sha))
+        while rename is not None:
+            date, previousPath = rename
+            yield previousPath, date
+            rename = self.lastRename(previousPath, date)
+    def lineage(self, path):
+        # returns all renames connected to path (from its predecessors to its successors) as a list of
+        # (date, sha, previous path, path) sorted by date
+        renames = set()
+        visited = set()
+        paths = [path]
+        while paths != []:
+            current = paths.pop()
+            if current in visited:
+                continue
+            visited.add(current)
+            for date, sha, previousPath in self.predecessors.get(current, []):
+                renames.add((date, sha, previousPath, current))
+                paths.append(previousPath)
+            for date, sha, nextPath in self.successors.get(current, []):
+                renames.add((date, sha, current, nextPath))
+                paths.append(nextPath)
+        return sorted(renames)
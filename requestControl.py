@@ -0,0 +1,70 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+#---------------------
+# requestControl.py
+# Delivers a controller adapting the number of requests sent in parallel to the GitHub API and
+# the delays between retries of failed requests
+# Author: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# Besides the hourly rate limit of each token, GitHub enforces secondary rate limits on bursts of
+# requests and answers them with a 403 or 429 (usually with a 'Retry-After' header). The server may
+# also fail temporarily (5xx answers, dropped connections). The controller limits the number of
+# requests in flight and adapts it with the AIMD scheme (additive increase, multiplicative decrease):
+# every successful request raises the limit by 1/limit (i.e. by one per round of requests), every
+# throttled or failed request halves it. Failed requests are retried after the delay given in
+# 'Retry-After', or else after an exponential backoff with full jitter (a random delay between 0 and
+# base * 2^attempt seconds, capped), so that retrying threads do not hit the server all at once.
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+import random
+import threading
+
+class apiError(Exception):
+    # raised when a request to the GitHub API failed and could not be retried
+    def __init__(self, url, status, message=''):
+        Exception.__init__(self, "request " + url + " failed (" + str(status) + ") " + message)
+        self.url = url
+        self.status = status
+
+class requestController:
+    def __init__(self, maxInFlight, retries=5, base=1.0, cap=300.0):
+        self.maxInFlight = maxInFlight
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+        self.limit = float(maxInFlight)
+        self.inFlight = 0
+        self.condition = threading.Condition()
+    def acquire(self):
+        # waits until the number of requests in flight is under the limit
+        with self.condition:
+            while self.inFlight >= max(1, int(self.limit)):
+                self.condition.wait()
+            self.inFlight += 1
+    def release(self):
+        with self.condition:
+            self.inFlight -= 1
+            self.condition.notify_all()
+    def success(self):
+        with self.condition:
+            self.limit = min(float(self.maxInFlight), self.limit + 1 / self.limit)
+            self.condition.notify_all()
+    def failure(self):
+        with self.condition:
+            self.limit = max(1.0, self.limit / 2)
+    def inFlightLimit(self):
+        with self.condition:
+            return max(1, int(self.limit))
+    def delay(self, attempt, retryAfter=None):
+        # seconds to wait before the given retry (first retry: attempt 0)
+        if retryAfter is not None:
+            return retryAfter
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
@@ -0,0 +1,69 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+#---------------------
+# responseArchive.py
+# Delivers an archive of the responses of the GitHub API, used to replay an extraction without network
+# Author: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# The archive is a SQLite database holding one entry per URL: the status, the headers needed to read
+# the response (Content-Type, Link, ETag, Last-Modified) and the body compressed with zlib. Responses
+# do not depend on the token used, the rate limit headers are not archived. The root URL of the API is
+# replaced by a placeholder in URLs, headers and bodies, so that an archive recorded with one root URL
+# (see the option --api of goMine.py) can be replayed with another one.
+# The archive can be written by several threads and processes at once.
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+import zlib
+import json
+import time
+import sqlite3
+import threading
+
+class responseArchive:
+    keptHeaders = ['Content-Type', 'Link', 'ETag', 'Last-Modified']
+    placeholder = '{api}'
+    def __init__(self, fileName, rootUrl):
+        self.rootUrl = rootUrl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self.connection = sqlite3.connect(fileName, timeout=60, check_same_thread=False)
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, status INTEGER, "
+                                    "headers TEXT, body BLOB, recorded REAL)")
+            self.connection.commit()
+    def key(self, url):
+        return url.replace(self.rootUrl, self.placeholder)
+    def get(self, url):
+        # returns (status, headers, body) of the archived response, or None if the URL has not been archived
+        with self.lock:
+            row = self.connection.execute("SELECT status, headers, body FROM responses WHERE url = ?", (self.key(url),)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        headers = {key: value.replace(self.placeholder, self.rootUrl) for key, value in json.loads(row[1]).items()}
+        body = zlib.decompress(row[2]).replace(self.placeholder.encode(), self.rootUrl.encode())
+        return row[0], headers, body
+    def put(self, url, status, headers, body):
+        keptHeaders = {key: headers[key].replace(self.rootUrl, self.placeholder) for key in self.keptHeaders if key in headers}
+        compressedBody = zlib.compress(body.replace(self.rootUrl.encode(), self.placeholder.encode()))
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                                    (self.key(url), status, json.dumps(keptHeaders), compressedBody, time.time()))
+            self.connection.commit()
+            self.recorded += 1
+    def close(self):
+        with self.lock:
+            self.connection.close()
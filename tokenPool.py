@@ -0,0 +1,85 @@
+#############################################################################################
+# SCRIPT INFORMATION
+#############################################################################################
+
+# LICENSE INFORMATION:
+#---------------------
+# tokenPool.py
+# Delivers a scheduler distributing API requests over several GitHub access tokens
+# Author: Jérémy Bonvoisin
+# Homepage: http://opensourcedesign.cc
+# License: GPL v.3
+
+# Each token has its own rate limit. The pool keeps track of the remaining requests and of the
+# reset time of each token, as given by the headers of the responses (X-RateLimit-Remaining,
+# X-RateLimit-Reset, X-RateLimit-Limit), and hands out the token with the most remaining requests.
+# A token is considered exhausted when its remaining requests drop below the threshold.
+# The budget (remaining requests and reset times) can be shared by several processes: it is then
+# created with a multiprocessing manager (see newBudget) and given to the pool of each process.
+
+#############################################################################################
+# HEADER
+#############################################################################################
+
+import time
+import threading
+
+def newBudget(logins, limit=5000, manager=None):
+    # tokens never used are assumed to have their full allowance
+    if manager is None:
+        return {'lock': threading.Lock(),
+                'limit': [limit for login in logins],
+                'remaining': [limit for login in logins],
+                'reset': [0 for login in logins]}
+    return {'lock': manager.Lock(),
+            'limit': manager.list([limit for login in logins]),
+            'remaining': manager.list([limit for login in logins]),
+            'reset': manager.list([0 for login in logins])}
+
+class tokenPool:
+    def __init__(self, logins, threshold=10, budget=None):
+        # logins: list of [username, token]
+        self.logins = logins
+        self.threshold = threshold
+        if budget is None:
+            budget = newBudget(logins)
+        self.lock = budget['lock']
+        self.limit = budget['limit']
+        self.remaining = budget['remaining']
+        self.reset = budget['reset']
+    def headroom(self, i):
+        if self.reset[i] <= time.time():
+            return self.limit[i]
+        return self.remaining[i]
+    def acquire(self):
+        # returns the login with the most headroom, or None if all tokens are exhausted
+        with self.lock:
+            i = max(range(len(self.logins)), key=self.headroom)
+            if self.headroom(i) < self.threshold:
+                return None
+            if self.reset[i] <= time.time():
+                self.remaining[i] = self.limit[i]
+            # count the request now, since several requests may be in flight with this token
+            self.remaining[i] -= 1
+            return self.logins[i]
+    def update(self, login, headers):
+        # responses without rate limit headers (e.g. server errors) are ignored
+        if not 'X-RateLimit-Reset' in headers or not 'X-RateLimit-Remaining' in headers:
+            return
+        with self.lock:
+            i = self.logins.index(login)
+            if 'X-RateLimit-Limit' in headers:
+                self.limit[i] = int(headers['X-RateLimit-Limit'])
+            if int(headers['X-RateLimit-Reset']) != self.reset[i]:
+                self.reset[i] = int(headers['X-RateLimit-Reset'])
+                self.remaining[i] = int(headers['X-RateLimit-Remaining'])
+            else:
+                # responses of requests in flight may arrive out of order
+                self.remaining[i] = min(self.remaining[i], int(headers['X-RateLimit-Remaining']))
+    def nextReset(self):
+        # time stamp at which the first exhausted token gets a new allowance
+        with self.lock:
+            return min(list(self.reset))
+    def status(self):
+        with self.lock:
+            return [(login[0], self.remaining[i], self.reset[i]) for i, login in enumerate(self.logins)]